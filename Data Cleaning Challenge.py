@@ -27,13 +27,36 @@ Data Cleaning Challenge
 
 
 """
-import pandas as pd
+
+from loaders import read_csv
+from stacked_tables import (segment_ids, first_name_boundary,
+                            attach_headers, parse_labelled_columns)
 
 """
 1. Load the dataset
 """
 path = "file path/data_cleaning_challenge.csv"
-data_import = pd.read_csv(path)
+data_import = read_csv(path)
+
+# For very big files, we can stream the file instead of loading
+# it all at once. Every chunk comes back already split into its
+# 'first name' rows and its data rows, with the 'Iterations'
+# column filled in (see steps 4 to 6 and 10 below).
+# See stacked_tables.py
+#
+# from stacked_tables import iter_stacked_chunks
+# for name_rows, data_rows in iter_stacked_chunks(path):
+#     print(name_rows.shape, data_rows.shape)
+
+# And if we still have the files which the teams submitted
+# (one table per file, .csv or excel), we do not need to paste
+# them into one file at all: we read and clean them all in
+# parallel, then concatenate them once.
+#
+# from stacked_tables import ingest_team_files
+# name_rows, data_rows, report = ingest_team_files(
+#     "file path/team_tables")
+# print(report)     # one row per file: rows, seconds, errors
 
 
 """
@@ -41,33 +64,7 @@ data_import = pd.read_csv(path)
 """
 
 
-def data_details(name_of_dataframe):
-    print('     Dataset Columns: ')
-    print('')
-    print(name_of_dataframe.columns)
-    print('')
-
-    print('     First Five Rows: ')
-    print('')
-    print(name_of_dataframe.head())
-    print('')
-
-    print('     Last Five Rows: ')
-    print('')
-    print(name_of_dataframe.tail())      # to see how many rows we have
-    print('')
-
-    print('     Total Information about the dataset: ')
-    print('')
-    print(name_of_dataframe.info())    # understand our data
-    print('')
-
-    print('     Description of the dataset: ')
-    print('')
-    print(name_of_dataframe.describe())
-    print('')
-
-
+# from data_profile import data_details
 # data_details(data_import)
 
 
@@ -92,6 +89,18 @@ drop_extra = data_import.drop(columns=["Unnamed: 9",
                                        "Unnamed: 10"])
 # data_details(drop_extra)
 
+# With big data, every new variable is a full copy of the data.
+# A FrameHistory keeps every step too, but shares the columns a
+# step did not change, so we can still roll back to any step
+# for a fraction of the memory. See frame_versions.py
+#
+# from frame_versions import FrameHistory
+# history = FrameHistory(data_import, 'data_import')
+# history.apply('drop_extra', lambda df: df.drop(
+#     columns=["Unnamed: 9", "Unnamed: 10"]))
+# drop_extra = history['drop_extra']
+# print(history.memory_usage())
+
 
 """
 4. Add an extra column AT THE END of the columns
@@ -114,29 +123,20 @@ drop_NaNs = drop_extra[drop_extra['Row Type'].notna()]
 # data_details(drop_NaNs)
 
 
-# Next, we create an empty list
-# (which we would finally use as our column to be inserted)
-column_values = []
-
-# next, we create a 'counter' variable
-counter = 0
-
-# create our 'for' loop
-for i in drop_NaNs['Row Type']:
-
-    # the ABOVE 'for loop' statement is going to iterate
-    # over all the values in the 'Row Type' Column.
-
-    # We then write an 'if' statement, targeting every
-    # time we encounter 'first name'.
-    # We do this because 'first name' belongs to every
-    # row in the 'Row Type' column which contains column
-    # names for each table in the dataset.
-
-    if 'first name' in i:
-        counter += 1
-
-    column_values.append(counter)
+# Next, we give every row the number of its table.
+#
+# The first version of this step used a 'for' loop over every
+# value in the 'Row Type' column: each time it met 'first name'
+# (the first row of every table in the dataset), it added 1 to
+# a counter, then appended the counter to a list.
+#
+# That loop is really a CUMULATIVE SUM over the rows which
+# contain 'first name', so we let numpy do it for us.
+# On files with millions of rows, this is MUCH faster.
+# The old loop (and a benchmark against it) lives in
+# stacked_tables.py
+column_values = segment_ids(drop_NaNs['Row Type'],
+                            first_name_boundary)
 
 
 # print(column_values)
@@ -235,22 +235,24 @@ name_dataframe.rename(columns={"Row Type": "First Name",
     
 """
 
-# we strip the first 12 characters (including empty space)
-# from every value in the 'First Name' column.
-# Note that these first 12 characters are 'first name: '
-
-name_dataframe['First Name'] = name_dataframe[
-    'First Name'].str[12:]
-
-# we do same for the 'Last name' column:
-
-name_dataframe['Last Name'] = name_dataframe[
-    'Last Name'].str[11:]
-
-# we do the same for the 'Date: ' column:
-
-name_dataframe['Date'] = name_dataframe[
-    'Date'].str[6:]
+# The first version of this step stripped the first 12
+# characters ('first name: ') from every 'First Name' value,
+# the first 11 ('last name:') from every 'Last Name' value and
+# the first 6 ('date: ') from every 'Date' value:
+#
+#     name_dataframe['First Name'] = name_dataframe[
+#         'First Name'].str[12:]
+#
+# Counting characters by hand breaks as soon as one cell has an
+# extra (or a missing) space after the colon.
+#
+# So we let parse_labelled_columns() find each label, remove it
+# together with ANY spaces after the colon, and turn the 'Date'
+# column into real dates.
+# See stacked_tables.py
+
+name_dataframe = parse_labelled_columns(
+    name_dataframe, ['First Name', 'Last Name', 'Date'])
 
 
 # data_details(name_dataframe)
@@ -301,12 +303,20 @@ no_name_dataframe = drop_extra_Column_Name_rows[
         https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.merge.html
         
 """
-cleaned_data = pd.merge(
-    left=name_dataframe,
-    right=no_name_dataframe,
-    how='inner',
-    on='Iterations'
-)
+# cleaned_data = pd.merge(
+#     left=name_dataframe,
+#     right=no_name_dataframe,
+#     how='inner',
+#     on='Iterations'
+# )
+
+# pd.merge works for ANY order of the 'Iterations' values.
+# But our two dataframes are already sorted by 'Iterations',
+# with exactly one name row per table, so we can simply repeat
+# each name row over the rows of its table: no hashing needed.
+# The result is the same as the pd.merge above.
+# See stacked_tables.py
+cleaned_data = attach_headers(name_dataframe, no_name_dataframe)
 
 
 # data_details(cleaned_data)
@@ -11,9 +11,10 @@ Data Cleaning in Python
         etc
 """
 
-import pandas as pd
 import numpy as np
 
+from loaders import read_csv
+
 
 """
 1. Loading or reading the file
@@ -38,7 +39,7 @@ path = "file path/unclean_data.csv"
     We solve the problem by specifying an encoding
 """
 
-df1 = pd.read_csv(path, encoding="latin1")
+df1 = read_csv(path, encoding="latin1")
 # print(df1.head())     # It worked
 
 """
@@ -60,6 +61,23 @@ df1 = pd.read_csv(path, encoding="latin1")
             3. latin1 (I just listed it again. No qualms)
 """
 
+"""
+1a. Solution 3
+
+    Let the loader find the encoding for us (see loaders.py).
+    
+    It only looks at the first 64 KB of the file to guess the
+        encoding, then checks the rest of the file while it is 
+        being read, so the file is NEVER read twice: if a later 
+        byte does not fit, the rest of the file is decoded with 
+        the next encoding (cp1252, then latin1).
+        
+    The answer is remembered (for as long as the file does not 
+        change), so loading the same file again skips the 
+        guessing altogether.
+"""
+# df1 = read_csv(path)
+
 
 """
 2. Inconsistent Column Names
@@ -73,7 +91,7 @@ df1 = pd.read_csv(path, encoding="latin1")
         We change the cases to UPPER
 """
 path2 = "file path/unclean_data1.csv"
-df2 = pd.read_csv(path2)
+df2 = read_csv(path2)
 
 
 """
@@ -129,6 +147,24 @@ df2.rename(columns={'DURATION': 'TIME'}, inplace=True)
 # print(df2.columns)
 
 
+"""
+The third solution is to clean the names up WHILE reading.
+
+    ColumnNames (see column_names.py) upper-cases the names, 
+        cleans up spaces and punctuation, and applies the 
+        aliases. read_csv() only needs the header line to do 
+        that, so 'usecols' can already use the clean names: the 
+        columns we do not want are never parsed.
+        
+    The alias map can be saved (names.save('aliases.json')) and 
+        shared by many files with slightly different headers.
+"""
+# from column_names import ColumnNames
+# names = ColumnNames(case='upper', aliases={'DURATION': 'TIME'})
+# df2 = read_csv(path2, column_names=names)
+# df2 = read_csv(path2, column_names=names, usecols=['TIME'])
+
+
 """
 3. MISSING DATA
 
@@ -250,6 +286,26 @@ mean_time = df2['TIME'].mean()
 # print(df2['TIME'])
 
 
+"""
+3.7.4 Many columns at once, per group, and remembering what 
+        was filled in.
+
+        Imputer (see imputation.py) computes the mean, median or 
+            mode of many columns in ONE pass (also chunk by chunk, 
+            for files too big for memory), optionally per group, 
+            then fills them in.
+            
+        It also returns WHICH values it filled in, so that a 
+            filled-in mean can still be told apart from a real 
+            value later.
+"""
+# from imputation import Imputer
+# imputer = Imputer({'TIME': 'mean'})
+# df3, imputed = imputer.fit(df2).transform(df2)
+# print(imputed['TIME'])            # True where TIME was filled in
+# print(imputer.fill_values())
+
+
 """
 3.8 Delete the row or column with missing data
 
@@ -313,3 +369,40 @@ def drop_rows_with_nan_values():
             Learn how to drop duplicates
             
 """
+
+
+"""
+3.10 Trying many thresholds, fast.
+
+        Each df2.dropna(thresh=...) goes over the whole 
+            dataframe again. To see how many rows each 'thresh' 
+            would leave, build a MissingIndex ONCE (see 
+            missing_values.py): it counts the missing values of 
+            every row, then answers for any 'thresh' (or 
+            'subset') without looking at the data again.
+"""
+# from missing_values import MissingIndex
+# index = MissingIndex(df2)
+# print(index.preview())                   # rows kept, per thresh
+# print(index.preview(subset=['TIME']))
+# df3 = index.dropna(df2, thresh=2)        # == df2.dropna(thresh=2)
+
+
+"""
+3.11 Duplicate rows (the assignment of 3.9)
+
+        df2.drop_duplicates() removes every row which repeats
+            an earlier one (or, with 'subset', which repeats its
+            values in those columns only).
+
+        For a very big dataframe, duplicates.py does the same
+            one chunk at a time: each row is hashed to a 64-bit
+            number, only the hashes are kept (spilled to disk
+            above 'max_keys'), and rows with the same hash are
+            compared, so the result is exact.
+"""
+# df3 = df2.drop_duplicates()
+# from duplicates import duplicated, drop_duplicates
+# df3 = drop_duplicates(df2)
+# print(duplicated(df2, subset=['NAME']).sum())
+# df3 = drop_duplicates(df2, max_keys=10_000_000, spill_dir='.')
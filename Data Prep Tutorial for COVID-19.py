@@ -42,10 +42,13 @@
 #     pip install descartes
 # """
 
-import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
 
+from loaders import fetch_all, read_csv
+from time_series import (ID_COLUMNS, SeriesStore, combine_series, light_melt,
+                         parse_dates, stream_melt)
+
 """
 1. Get Url to data
 
@@ -99,11 +102,23 @@ death_cases_url = "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/mas
     
     Since the data is in .csv() format, we'll use 
         pandas.read_csv()
+
+    fetch_all() (loaders.py) first downloads the three files at
+        the same time, instead of one after the other, and only
+        when they changed since the last run: max_age=0 asks the
+        server on every run (a short request, answered with 'Not
+        Modified' when the file did not change), since the files
+        are updated every day. The read_csv() calls below, and
+        the ones in get_and_melt_data(), then read the local
+        copies.
 """
 
-df_confirmed = pd.read_csv(confirmed_cases_url)
-df_recovered = pd.read_csv(recovered_cases_url)
-df_death = pd.read_csv(death_cases_url)
+fetch_all([confirmed_cases_url, recovered_cases_url, death_cases_url],
+          max_age=0)
+
+df_confirmed = read_csv(confirmed_cases_url)
+df_recovered = read_csv(recovered_cases_url)
+df_death = read_csv(death_cases_url)
 
 
 """
@@ -111,31 +126,7 @@ df_death = pd.read_csv(death_cases_url)
 """
 
 
-def data_details(name_of_dataframe):
-    print(name_of_dataframe.columns)
-    print('')
-
-    print('     First Five Rows: ')
-    print('')
-    print(name_of_dataframe.head())
-    print('')
-
-    print('     Last Five Rows: ')
-    print('')
-    print(name_of_dataframe.tail())      # to see how many rows we have
-    print('')
-
-    print('     Total Information about the dataset: ')
-    print('')
-    print(name_of_dataframe.info())    # understand our data
-    print('')
-
-    print('     Description of the dataset: ')
-    print('')
-    print(name_of_dataframe.describe())
-    print('')
-
-
+# from data_profile import data_details
 # data_details(df_confirmed)
 
 
@@ -177,6 +168,10 @@ confirmed_df.rename(
     columns={"variable": "Date", "value": "Confirmed"},
     inplace=True)
 
+# 'Date' holds '1/22/20' once per location: parse_dates()
+# (time_series.py) parses each of the days once, not every row
+confirmed_df['Date'] = parse_dates(confirmed_df['Date'])
+
 # data_details(confirmed_df)
 
 
@@ -186,8 +181,32 @@ confirmed_df.rename(
 """
 
 
-def get_and_melt_data(data_url, case_type):
-    df = pd.read_csv(data_url)
+def get_and_melt_data(data_url, case_type, store_dir=None, light=False,
+                      output=None):
+    # output='confirmed.parquet' (or .csv): melt the file a few rows
+    # at a time, straight into 'output', without ever loading it
+    # whole. Returns the number of rows written.
+    if output is not None:
+        return stream_melt(data_url, output, ID_COLUMNS, var_name="Date",
+                           value_name=case_type, var_type="datetime")
+
+    df = read_csv(data_url)
+
+    # light=True: categorical id columns (stored once, not once
+    # per day) and real dates in 'Date' (see time_series.py)
+    if light:
+        return light_melt(df, ID_COLUMNS, var_name="Date",
+                          value_name=case_type, var_type="datetime",
+                          date_format="%m/%d/%y")
+
+    # with a 'store_dir' (see section 10), only the new days are
+    # melted, and added to the long table kept there
+    if store_dir is not None:
+        store = SeriesStore(store_dir, case_type)
+        store.update(df)
+        melted_df = store.load()
+        melted_df["Date"] = parse_dates(melted_df["Date"])
+        return melted_df
 
     # melt df above
     melted_df = df.melt(id_vars=[
@@ -201,6 +220,9 @@ def get_and_melt_data(data_url, case_type):
         columns={"variable": "Date", "value": case_type},
         inplace=True)
 
+    # each distinct date parsed once (see 4.2)
+    melted_df["Date"] = parse_dates(melted_df["Date"])
+
     # return
     return melted_df
 
@@ -249,11 +271,20 @@ new_df = confirmed_df.join(death_df['Death'])
 
 # We now 'further' merge with the 'Recovered' column
 # of the recovered_df.
-final_df = confirmed_df.join(
-    death_df['Death']).join(
-    recovered_df['Recovered'])
+# final_df = confirmed_df.join(
+#     death_df['Death']).join(
+#     recovered_df['Recovered'])
+
+# .join() puts the rows side by side by POSITION: the rows of the
+# smaller recovered dataset end up next to the wrong locations.
+# combine_series() (time_series.py) matches them on their key
+# (Province/State, Country/Region, Date), and lists the keys
+# which one dataset has and the other has not.
+final_df, unmatched = combine_series([confirmed_df, death_df,
+                                      recovered_df])
 
 # data_details(final_df)
+# print(unmatched.groupby(['Only in', 'Missing from']).size())
 
 """
 NOTE
@@ -357,3 +388,26 @@ world.geometry.boundary.plot(color=None,
                     there.
 """
 
+
+"""
+10 a. Instead of melting the whole history again every day,
+        keep the melted data in 'autodata' (time_series.py):
+        each run only melts the days (and corrected cells)
+        which are new since the last run.
+"""
+
+# confirmed_df = get_and_melt_data(confirmed_cases_url, "Confirmed",
+#                                  store_dir="autodata/confirmed")
+# recovered_df = get_and_melt_data(recovered_cases_url, "Recovered",
+#                                  store_dir="autodata/recovered")
+# death_df = get_and_melt_data(death_cases_url, "Death",
+#                              store_dir="autodata/death")
+
+"""
+10 b. Or, when the files get too big to load, write the melted
+        data of the day straight to 'autodata' (see
+        stream_melt() in time_series.py).
+"""
+
+# get_and_melt_data(confirmed_cases_url, "Confirmed",
+#                   output="autodata/confirmed.parquet")
@@ -15,15 +15,21 @@ Data Wrangling in Python
 
 """
 
-import pandas as pd
 import matplotlib.pylab as plt
-import numpy as np
+
+from loaders import read_csv, reheader
 
 """
 1. Load the data
+
+        read_csv() downloads the file only once: later runs read
+            the copy kept in ~/.cache/data-manipulation/http.
+
+        sentinels='?' reads the '?'s of the file as NaN (see
+            section 5).
 """
 fileName = "https://s3-api.us-geo.objectstorage.softlayer.net/cf-courses-data/CognitiveClass/DA0101EN/auto.csv"
-df = pd.read_csv(fileName)
+df = read_csv(fileName, sentinels='?')
 
 
 """
@@ -31,33 +37,7 @@ df = pd.read_csv(fileName)
 """
 
 
-def data_details(name_of_dataframe):
-    print('     Dataset Columns: ')
-    print('')
-    print(name_of_dataframe.columns)
-    print('')
-
-    print('     First Five Rows: ')
-    print('')
-    print(name_of_dataframe.head())
-    print('')
-
-    print('     Last Five Rows: ')
-    print('')
-    print(name_of_dataframe.tail())      # to see how many rows we have
-    print('')
-
-    print('     Total Information about the dataset: ')
-    print('')
-    print(name_of_dataframe.info())    # understand our data
-    print('')
-
-    print('     Description of the dataset: ')
-    print('')
-    print(name_of_dataframe.describe())
-    print('')
-
-
+# from data_profile import data_details
 # data_details(df)
 
 
@@ -90,16 +70,23 @@ headers = ["symboling", "normalized-losses", "make",
 
 """
 4. Now, we add the headers to the dataframe
+
+        The first row of the file was read as the header of df.
+            reheader() puts it back as the first row and sets the
+            real column names, so that we do not have to load the
+            file a second time with:
+
+                df_2 = read_csv(fileName, names=headers)
 """
 
-df_2 = pd.read_csv(fileName, names=headers)
+df_2 = reheader(df, headers)
 # data_details(df_2)
 
 
 """
 5. Replace '?'s with 'NaN's
 
-        When we look at df_2, we see that some columns
+        When we look at the file, we see that some columns
             have issues with the data in them.
             
             For example, the 'normalized loses' column
@@ -119,9 +106,26 @@ df_2 = pd.read_csv(fileName, names=headers)
             
             Also, we can use this method to replace so many 
             different digits/symbols in the same dataset.
+
+
+        Solution 2:
+
+            df_2.replace() copies the whole dataset, and the 
+            columns which held '?'s (normalized-losses, bore, 
+            stroke, horsepower, peak-rpm, price) are still text 
+            afterwards, which we would have to convert ourselves.
+            
+            With 'sentinels' (given to the one load of section 
+            1), the '?'s become NaN while the file is parsed, and 
+            those columns come out as numbers; reheader() treats 
+            a '?' in the header row the same way. See 
+            benchmark_sentinels() in loaders.py for the time and 
+            memory saved.
 """
 
-df_3 = df_2.replace('?', np.nan)
+# import numpy as np
+# df_3 = df_2.replace('?', np.nan)
+df_3 = df_2     # the '?'s are NaN already
 # data_details(df_3)
 
 
@@ -142,14 +146,23 @@ missing_values = df_3.isnull()
 """
 
 
-def column_value_frequency(dataframe):
-    for column in dataframe.columns.values.tolist():
-        print(column)
-        print(dataframe[column].value_counts())
-        print("")
+# column_value_frequency() now lives in frequencies.py, as
+# value_frequencies(). It counts all the columns, chunk by chunk,
+# and RETURNS the counts, instead of printing them:
+#
+#   frequencies = value_frequencies(df_3)
+#   print(frequencies)                 # the old output
+#   frequencies['make']                # the counts of one column
+#   frequencies.top(3)                 # the 3 most frequent values
+#
+# It also counts files too big for memory, chunk by chunk:
+#
+#   value_frequencies(read_csv(fileName, names=headers,
+#                              chunksize=100_000), top=10)
 
 
-# column_value_frequency(df_3)
+# from frequencies import value_frequencies
+# print(value_frequencies(df_3))
 
 
 """
@@ -157,13 +170,23 @@ def column_value_frequency(dataframe):
 """
 
 
-def check_missing_values(dataframe):
-    global check_missing
-    check_missing = dataframe.isnull()
-
-    for column in check_missing.columns.values.tolist():
-        print(column)
-        print(check_missing[column].value_counts())
+# check_missing_values() now lives in missing_values.py, as
+# analyze_missing(). It no longer builds a frame of booleans in a
+# global variable: it returns a report, with the counts per column
+# and per row, and which columns are missing together:
+#
+#   missing = analyze_missing(df_3)
+#   print(missing)                     # the old output, and more
+#   missing.columns                    # nulls per column
+#   missing.row_nulls                  # nulls per row
+#   missing.co_missing                 # rows missing both columns
+#   missing.patterns                   # columns missing together
+#
+# Files too big for memory are analyzed chunk by chunk:
+#
+#   analyze_missing(read_csv(fileName, names=headers,
+#                            sentinels='?', chunksize=100_000))
 
 
-# check_missing_values(df_3)
+# from missing_values import analyze_missing
+# print(analyze_missing(df_3))
@@ -3,7 +3,8 @@ PyData DC 2018: Cleaning data with pandas
 
 """
 
-import pandas as pd
+
+from loaders import read_csv
 
 """
 1. Load Data
@@ -19,7 +20,7 @@ import pandas as pd
 """
 
 path = "C:/Users/HP/PycharmProjects/MachineLearningEnow/Py_Data_DC_2018/pydatadc_2018-tidy-master/data/gapminder.tsv"
-df = pd.read_csv(path, sep='\t')
+df = read_csv(path, sep='\t')
 
 
 """
@@ -27,33 +28,7 @@ df = pd.read_csv(path, sep='\t')
 """
 
 
-def data_details(name_of_dataframe):
-    print('     Dataset Columns: ')
-    print('')
-    print(name_of_dataframe.columns)
-    print('')
-
-    print('     First Five Rows: ')
-    print('')
-    print(name_of_dataframe.head())
-    print('')
-
-    print('     Last Five Rows: ')
-    print('')
-    print(name_of_dataframe.tail())      # to see how many rows we have
-    print('')
-
-    print('     Total Information about the dataset: ')
-    print('')
-    print(name_of_dataframe.info())    # understand our data
-    print('')
-
-    print('     Description of the dataset: ')
-    print('')
-    print(name_of_dataframe.describe())
-    print('')
-
-
+# from data_profile import data_details
 # data_details(df)
 
 
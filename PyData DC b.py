@@ -18,37 +18,16 @@ Tidying data
 
 import pandas as pd
 
+from loaders import read_csv
+from time_series import parse_dates
+
 
 """
-1. Define our data details function
+1. Our data details function (see data_profile.py)
 """
 
 
-def data_details(name_of_dataframe):
-    print('     Dataset Columns: ')
-    print('')
-    print(name_of_dataframe.columns)
-    print('')
-
-    print('     First Five Rows: ')
-    print('')
-    print(name_of_dataframe.head())
-    print('')
-
-    print('     Last Five Rows: ')
-    print('')
-    print(name_of_dataframe.tail())      # to see how many rows we have
-    print('')
-
-    print('     Total Information about the dataset: ')
-    print('')
-    print(name_of_dataframe.info())    # understand our data
-    print('')
-
-    print('     Description of the dataset: ')
-    print('')
-    print(name_of_dataframe.describe())
-    print('')
+# from data_profile import data_details
 
 
 """
@@ -56,7 +35,7 @@ def data_details(name_of_dataframe):
 """
 
 path = "C:/Users/HP/PycharmProjects/MachineLearningEnow/Py_Data_DC_2018/pydatadc_2018-tidy-master/data/pew.csv"
-pew = pd.read_csv(path)
+pew = read_csv(path)
 
 # data_details(pew)
 
@@ -138,7 +117,7 @@ pew_long_data = pd.melt(pew,
         
 """
 path_2 = "C:/Users/HP/PycharmProjects/MachineLearningEnow/Py_Data_DC_2018/pydatadc_2018-tidy-master/data/billboard.csv"
-billboard = pd.read_csv(path_2)
+billboard = read_csv(path_2)
 # data_details(billboard)
 
 
@@ -156,8 +135,23 @@ billboard_melt = pd.melt(billboard,
                          value_name='rating'
                          )
 
+# 'date.entered' repeats the date of each song once per week:
+# parse_dates() (time_series.py) parses each distinct date once
+billboard_melt['date.entered'] = parse_dates(
+    billboard_melt['date.entered'])
+
 # data_details(billboard_melt)
 
+# light_melt() (time_series.py) gives the same rows, but keeps
+# 'year', 'artist', 'track' ... ONCE (as categoricals) instead of
+# once per week, and turns the week names into week numbers:
+# from time_series import light_melt
+# billboard_melt = light_melt(billboard,
+#                             id_vars=['year', 'artist', 'track',
+#                                      'time', 'date.entered'],
+#                             var_name='week', value_name='rating',
+#                             var_type='int')
+
 
 """
 6. What if we had a column which was storing more than one
@@ -196,7 +190,7 @@ billboard_melt = pd.melt(billboard,
 """
 
 path_3 = "C:/Users/HP/PycharmProjects/MachineLearningEnow/Py_Data_DC_2018/pydatadc_2018-tidy-master/data/country_timeseries.csv"
-ebola = pd.read_csv(path_3)
+ebola = read_csv(path_3)
 # data_details(ebola)
 
 
@@ -290,7 +284,7 @@ ebola_long[['status', 'country']] = (ebola_long['variable']
         Let us load it:
 """
 path_4 = "C:/Users/HP/PycharmProjects/MachineLearningEnow/Py_Data_DC_2018/pydatadc_2018-tidy-master/data/weather.csv"
-weather = pd.read_csv(path_4)
+weather = read_csv(path_4)
 # data_details(weather)
 
 
@@ -333,6 +327,20 @@ weather_melt = pd.melt(
 
 # data_details(weather_melt)
 
+# or, with the days as numbers ('d1' is 1):
+# from time_series import light_melt
+# weather_melt = light_melt(weather,
+#                           id_vars=['id', 'year', 'month', 'element'],
+#                           var_name='day', value_name='temp',
+#                           var_type='int')
+
+# 'day' alone is not a date; with the year and the month it is,
+# and parse_dates() reads each of the (few) distinct days once:
+# weather_melt['date'] = parse_dates(
+#     weather_melt['year'].astype(str) + '-'
+#     + weather_melt['month'].astype(str) + '-'
+#     + weather_melt['day'].str[1:], date_format='%Y-%m-%d')
+
 
 """
 9.2 At this point, if you want to build a model which 
@@ -477,6 +485,11 @@ billboard_songs = billboard_melt[['year',
 billboard_songs = billboard_songs.drop_duplicates()
 # data_details(billboard_songs)   # The data now has 317 rows. Wow!!
 
+# For a frame too big for drop_duplicates() (duplicates.py): it
+#   hashes the rows chunk by chunk, and can spill the hashes to disk.
+# from duplicates import drop_duplicates
+# billboard_songs = drop_duplicates(billboard_songs, max_keys=1_000_000)
+
 """
 10 e. Now you have a 'songs' dataset.
 
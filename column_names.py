@@ -0,0 +1,135 @@
+"""
+Column Names
+
+    Section 2 of 'Data Cleaning.py' fixes inconsistent column names
+        AFTER the whole file is loaded:
+
+        df2.columns = df2.columns.str.upper()
+        df2.rename(columns={'DURATION': 'TIME'}, inplace=True)
+
+    ColumnNames does the same on the NAMES only, so read_csv() can
+        apply it while reading (see loaders.py):
+
+        names = ColumnNames(case='upper',
+                            aliases={'DURATION': 'TIME'})
+        df2 = read_csv(path2, column_names=names,
+                       usecols=['TIME', 'NAME'])
+
+        - the names are cleaned up: spaces at the ends removed,
+          runs of spaces and punctuation replaced by one
+          'separator', and the case folded,
+        - then the aliases are applied (the alias map is cleaned up
+          the same way, so 'Duration', ' duration ' and 'DURATION'
+          all become 'TIME'),
+        - read_csv() reads only the header line to do this, so
+          'usecols', 'dtype' ... can use the clean names, and the
+          columns we do not want are never parsed.
+
+    Many files with slightly different headers can share one alias
+        map, kept in a .json file:
+
+        names = ColumnNames.load('aliases.json')
+        names.add_alias('Length of call', 'TIME')
+        names.save()
+"""
+import json
+import os
+import re
+
+
+# a run of anything but letters and digits
+SEPARATORS = re.compile(r'[\W_]+')
+
+
+class ColumnNames:
+    def __init__(self, aliases=None, case='lower', separator='_',
+                 path=None):
+        """
+        'aliases': {alias: canonical name}.
+        'case': 'lower', 'upper', or None to keep the case.
+        'separator': what runs of spaces and punctuation become.
+        'path': the .json file that save() writes to.
+        """
+        if case not in ('lower', 'upper', None):
+            raise ValueError("'case' must be 'lower', 'upper' or None")
+
+        self.case = case
+        self.separator = separator
+        self.path = path
+        self.aliases = {}
+        for alias, canonical in (aliases or {}).items():
+            self.add_alias(alias, canonical)
+
+    def clean(self, name):
+        """
+        The name with its spaces, punctuation and case cleaned up,
+        but no alias applied.
+        """
+        name = SEPARATORS.sub(self.separator, str(name).strip())
+        if self.separator:
+            name = name.strip(self.separator)
+
+        if self.case == 'lower':
+            return name.casefold()
+        if self.case == 'upper':
+            return name.upper()
+        return name
+
+    def canonical(self, name):
+        name = self.clean(name)
+        return self.aliases.get(name, name)
+
+    def add_alias(self, alias, canonical):
+        self.aliases[self.clean(alias)] = self.clean(canonical)
+
+    def mapping(self, names):
+        """
+        {name: canonical name} for a list of column names. Two
+        names which end up the same get '_2', '_3' ... added, the
+        way pandas adds '.1', '.2' ... to repeated names.
+        """
+        mapping = {}
+        used = {}
+        for name in names:
+            canonical = self.canonical(name)
+            used[canonical] = used.get(canonical, 0) + 1
+            if used[canonical] > 1:
+                canonical += self.separator + str(used[canonical])
+            mapping[name] = canonical
+
+        return mapping
+
+    def rename(self, frame):
+        """
+        Rename the columns of a frame which is already loaded.
+        """
+        return frame.rename(columns=self.mapping(frame.columns))
+
+    def to_dict(self):
+        return {'aliases': self.aliases, 'case': self.case,
+                'separator': self.separator}
+
+    def save(self, path=None):
+        path = path or self.path
+        if path is None:
+            raise ValueError('no path to save the column names to')
+
+        with open(path, 'w') as names_file:
+            json.dump(self.to_dict(), names_file, indent=4,
+                      sort_keys=True)
+        self.path = path
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load the column names saved at 'path' (or start an empty
+        alias map there, if there is no file yet).
+        """
+        if not os.path.exists(path):
+            return cls(path=path)
+
+        with open(path) as names_file:
+            settings = json.load(names_file)
+
+        return cls(settings.get('aliases'), settings.get('case', 'lower'),
+                   settings.get('separator', '_'), path)
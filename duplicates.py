@@ -0,0 +1,486 @@
+"""
+Duplicates
+
+    df.drop_duplicates() ('PyData DC b.py', 10 d, and the
+        assignment at the end of 'Data Cleaning.py') needs the
+        whole frame in memory, plus a hash table of every row.
+
+    The functions below find duplicate rows ONE CHUNK AT A TIME:
+
+        - every row (or only the 'subset' columns) is hashed to a
+          64-bit number (pd.util.hash_pandas_object),
+        - the hashes of the rows seen so far are kept in a compact
+          set: sorted numpy arrays of 8-byte hashes, with the
+          position of the first row of each (no Python objects,
+          no copy of the data),
+        - a row whose hash is already in the set is a duplicate
+          CANDIDATE. Two different rows can have the same hash, so
+          candidates are verified:
+            - exactly, by comparing the two rows, when the data is
+              in memory (duplicated(), drop_duplicates()),
+            - with a second, independent 64-bit hash when the rows
+              are streamed and gone (find_duplicates()),
+        - when the set grows beyond 'max_keys' hashes, it is
+          spilled to disk: the hashes go to partition files (by
+          their first bits), and each partition is sorted on its
+          own at the end, so memory stays bounded.
+
+    A frame of at most 'max_keys' rows fits in memory together with
+        its hash table, and pandas' own duplicated() is faster
+        there (2.5 to 8 times at 2 million rows): duplicated() and
+        drop_duplicates() simply call it. The hashes, and the
+        spilling, are for bigger frames and for streamed chunks.
+
+    Only keep='first' is supported: a row is a duplicate when an
+        EARLIER row has the same values.
+
+        duplicated(df, subset=['year', 'artist', 'track'])
+        drop_duplicates(df)
+        find_duplicates(pd.read_csv(path, chunksize=1_000_000))
+        drop_duplicates_chunks(lambda: pd.read_csv(
+            path, chunksize=1_000_000))
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from data_profile import chunks_of
+from loaders import measure
+
+
+HASH_KEY = '0123456789123456'
+
+# for the second hash, which verifies streamed candidates
+CHECK_KEY = 'fedcba9876543210'
+
+MAX_KEYS = 100_000_000
+
+PARTITIONS = 64
+
+SPILLED = np.dtype([('hash', '<u8'), ('check', '<u8'),
+                    ('position', '<i8')])
+
+
+def row_hashes(chunk, hash_key=HASH_KEY):
+    # 0.0 and -0.0 are the same value to duplicated(), but their
+    # bytes, and so their hashes, differ: adding 0.0 makes -0.0 0.0
+    floats = [position for position, dtype in enumerate(chunk.dtypes)
+              if pd.api.types.is_float_dtype(dtype)]
+    if floats:
+        chunk = chunk.copy(deep=False)
+        for position in floats:
+            chunk.isetitem(position, chunk.iloc[:, position] + 0.0)
+
+    return pd.util.hash_pandas_object(chunk, index=False,
+                                      hash_key=hash_key).to_numpy()
+
+
+"""
+1. A compact set of hashes
+
+    A few sorted runs of hashes (each with the position of its
+        first row and its check hash). New hashes make a new run;
+        runs of about the same size are merged, so there are only
+        about log2(n) runs to search.
+"""
+
+
+def merge_runs(older, newer):
+    """
+    Merge two sorted runs into one, without sorting again: the
+    newer hashes go where np.searchsorted() says.
+    """
+    at = np.searchsorted(older[0], newer[0])
+    at += np.arange(len(at))
+    is_newer = np.zeros(len(older[0]) + len(at), dtype=bool)
+    is_newer[at] = True
+
+    merged = []
+    for old_values, new_values in zip(older, newer):
+        values = np.empty(len(is_newer), dtype=old_values.dtype)
+        values[at] = new_values
+        values[~is_newer] = old_values
+        merged.append(values)
+
+    return tuple(merged)
+
+
+class HashSet:
+    def __init__(self):
+        self.runs = []
+
+    def __len__(self):
+        return sum(len(hashes) for hashes, _, _ in self.runs)
+
+    def lookup(self, hashes):
+        """
+        Return (found, position, check) for every hash: whether it
+        is in the set, and the position and check hash of its row.
+        """
+        found = np.zeros(len(hashes), dtype=bool)
+        positions = np.zeros(len(hashes), dtype=np.int64)
+        checks = np.zeros(len(hashes), dtype=np.uint64)
+
+        # searching sorted hashes is several times faster: each
+        # search starts near where the last one ended, in the cache
+        order = np.argsort(hashes)
+        hashes = hashes[order]
+        for run_hashes, run_positions, run_checks in self.runs:
+            at = np.searchsorted(run_hashes, hashes)
+            at[at == len(run_hashes)] = 0
+            hit = (run_hashes[at] == hashes) & ~found
+            found |= hit
+            positions[hit] = run_positions[at[hit]]
+            checks[hit] = run_checks[at[hit]]
+
+        unsorted = np.empty_like(order)
+        unsorted[order] = np.arange(len(order))
+        return found[unsorted], positions[unsorted], checks[unsorted]
+
+    def add(self, hashes, positions, checks):
+        if not len(hashes):
+            return
+
+        order = np.argsort(hashes)
+        self.runs.append((hashes[order], positions[order],
+                          checks[order]))
+
+        while (len(self.runs) > 1
+               and len(self.runs[-2][0]) <= 2 * len(self.runs[-1][0])):
+            newer = self.runs.pop()
+            older = self.runs.pop()
+            self.runs.append(merge_runs(older, newer))
+
+    def arrays(self):
+        if not self.runs:
+            return [np.zeros(0, dtype=dtype)
+                    for dtype in (np.uint64, np.int64, np.uint64)]
+
+        return [np.concatenate(values) for values in zip(*self.runs)]
+
+
+"""
+2. Finding the duplicates, chunk after chunk
+"""
+
+
+class DuplicateFinder:
+    def __init__(self, subset=None, check=True, max_keys=MAX_KEYS,
+                 spill_dir=None, partitions=PARTITIONS):
+        """
+        'check': compute the second hash, to verify candidates when
+            the rows cannot be compared (streamed data).
+        'max_keys': the number of distinct rows kept in memory
+            before spilling to 'spill_dir' (a temporary folder by
+            default).
+        """
+        self.subset = subset
+        self.check = check
+        self.max_keys = max_keys
+        self.spill_dir = spill_dir
+        self.partitions = partitions
+        self.seen = HashSet()
+        self.collided = {}          # (hash, check) -> position
+        self.duplicates = []        # (positions, first positions)
+        self.n_rows = 0
+        self.folder = None
+
+    def update(self, chunk):
+        if self.subset is not None:
+            chunk = chunk[self.subset]
+
+        start = self.n_rows
+        self.n_rows += len(chunk)
+        hashes = row_hashes(chunk)
+        checks = (row_hashes(chunk, CHECK_KEY) if self.check
+                  else np.zeros(len(chunk), dtype=np.uint64))
+        positions = np.arange(start, self.n_rows)
+
+        if self.folder is not None:
+            self.spill(hashes, checks, positions)
+            return self
+
+        # the first row of every hash in the chunk
+        codes, uniques = pd.factorize(hashes)
+        uniques = np.asarray(uniques, dtype=np.uint64)
+        first = np.empty(len(uniques), dtype=np.int64)
+        first[codes[::-1]] = np.arange(len(chunk) - 1, -1, -1)
+
+        found, seen_positions, seen_checks = self.seen.lookup(uniques)
+        first_positions = np.where(found, seen_positions,
+                                   start + first)[codes]
+        first_checks = np.where(found, seen_checks,
+                                checks[first])[codes]
+
+        candidate = first_positions != positions
+        if self.check:
+            collided = candidate & (first_checks != checks)
+            if collided.any():
+                first_positions[collided] = self.resolve_collisions(
+                    hashes[collided], checks[collided],
+                    positions[collided])
+                candidate = first_positions != positions
+
+        self.duplicates.append((positions[candidate],
+                                first_positions[candidate]))
+
+        new = ~found
+        self.seen.add(uniques[new], start + first[new],
+                      checks[first[new]])
+        if len(self.seen) > self.max_keys:
+            self.start_spilling()
+
+        return self
+
+    def resolve_collisions(self, hashes, checks, positions):
+        """
+        Rows whose hash was seen, but not their check hash: the
+        same hash for two different rows. Rare, so done one by one.
+        """
+        firsts = []
+        for key, position in zip(zip(hashes.tolist(), checks.tolist()),
+                                 positions.tolist()):
+            firsts.append(self.collided.setdefault(key, position))
+
+        return np.array(firsts, dtype=np.int64)
+
+    def start_spilling(self):
+        self.folder = tempfile.mkdtemp(dir=self.spill_dir)
+        hashes, positions, checks = self.seen.arrays()
+        self.seen = HashSet()
+        self.spill(hashes, checks, positions)
+
+        if self.collided:
+            keys = np.array(list(self.collided), dtype=np.uint64)
+            self.spill(keys[:, 0], keys[:, 1],
+                       np.array(list(self.collided.values())))
+            self.collided = {}
+
+    def spill(self, hashes, checks, positions):
+        records = np.empty(len(hashes), dtype=SPILLED)
+        records['hash'] = hashes
+        records['check'] = checks
+        records['position'] = positions
+
+        # the first bits of the hash choose the partition
+        partition = (hashes >> np.uint64(58)) % self.partitions
+        order = np.argsort(partition, kind='stable')
+        records = records[order]
+        bounds = np.searchsorted(partition[order],
+                                 np.arange(self.partitions + 1))
+
+        for number in range(self.partitions):
+            part = records[bounds[number]:bounds[number + 1]]
+            if len(part):
+                with open(self.partition_path(number), 'ab') as part_file:
+                    part.tofile(part_file)
+
+    def partition_path(self, number):
+        return os.path.join(self.folder, str(number) + '.bin')
+
+    def spilled_duplicates(self):
+        for number in range(self.partitions):
+            path = self.partition_path(number)
+            if not os.path.exists(path):
+                continue
+
+            records = np.fromfile(path, dtype=SPILLED)
+            order = np.lexsort((records['position'], records['check'],
+                                records['hash']))
+            records = records[order]
+
+            same = ((records['hash'][1:] == records['hash'][:-1])
+                    & (records['check'][1:] == records['check'][:-1]))
+            group_start = np.flatnonzero(np.append(True, ~same))
+            group = np.cumsum(np.append(True, ~same)) - 1
+            firsts = records['position'][group_start][group]
+
+            duplicate = np.append(False, same)
+            yield records['position'][duplicate], firsts[duplicate]
+
+    def result(self):
+        """
+        Return (positions of the duplicate rows, positions of the
+        first row each one duplicates), sorted by position.
+        """
+        parts = list(self.duplicates)
+        if self.folder is not None:
+            parts += list(self.spilled_duplicates())
+            shutil.rmtree(self.folder, ignore_errors=True)
+            self.folder = None
+
+        if not parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        positions = np.concatenate([part[0] for part in parts])
+        firsts = np.concatenate([part[1] for part in parts])
+        order = np.argsort(positions, kind='stable')
+        return positions[order], firsts[order]
+
+
+"""
+3. In memory: exact
+"""
+
+
+def rows_equal(frame, columns, left, right, block_rows=1_000_000):
+    """
+    For every pair of positions, whether the two rows of 'frame'
+    have the same values in 'columns' (missing values count as
+    equal, as in drop_duplicates()). Done 'block_rows' pairs at a
+    time, so the copies stay small.
+    """
+    equal = np.ones(len(left), dtype=bool)
+    for start in range(0, len(left), block_rows):
+        block = slice(start, start + block_rows)
+        for column in columns:
+            a = frame[column].take(left[block]).reset_index(drop=True)
+            b = frame[column].take(right[block]).reset_index(drop=True)
+            same = (a == b).fillna(False).to_numpy(dtype=bool)
+            equal[block] &= same | (a.isna() & b.isna()).to_numpy()
+
+    return equal
+
+
+def subset_columns(frame, subset):
+    if subset is None:
+        return list(frame.columns)
+    if isinstance(subset, str):
+        return [subset]
+    return list(subset)
+
+
+def duplicated(frame, subset=None, chunk_rows=1_000_000,
+               max_keys=MAX_KEYS, spill_dir=None):
+    """
+    Like frame.duplicated(subset): True for every row with the same
+    values as an earlier row. Frames of at most 'max_keys' rows go
+    to frame.duplicated() itself.
+    """
+    if len(frame) <= max_keys:
+        return frame.duplicated(subset)
+
+    columns = subset_columns(frame, subset)
+    finder = DuplicateFinder(columns, check=False, max_keys=max_keys,
+                             spill_dir=spill_dir)
+    for chunk in chunks_of(frame, chunk_rows):
+        finder.update(chunk)
+
+    positions, firsts = finder.result()
+
+    # the hashes only PROPOSE duplicates: compare the rows
+    equal = rows_equal(frame, columns, positions, firsts)
+    if not equal.all():
+        # two different rows with the same hash: find the true
+        # duplicates among all the rows with that hash
+        collided = np.unique(np.concatenate([positions[~equal],
+                                             firsts[~equal]]))
+        hashes = row_hashes(frame[columns].take(collided))
+        same_hash = np.concatenate([
+            np.flatnonzero(np.isin(row_hashes(chunk[columns]), hashes))
+            + start
+            for start, chunk in zip(range(0, len(frame), chunk_rows),
+                                    chunks_of(frame, chunk_rows))])
+        exact = frame[columns].take(same_hash).duplicated().to_numpy()
+        positions = np.union1d(positions[equal], same_hash[exact])
+
+    result = np.zeros(len(frame), dtype=bool)
+    result[positions] = True
+    return pd.Series(result, index=frame.index)
+
+
+def drop_duplicates(frame, subset=None, max_keys=MAX_KEYS, **options):
+    if len(frame) <= max_keys:
+        return frame.drop_duplicates(subset)
+
+    return frame[~duplicated(frame, subset, max_keys=max_keys,
+                             **options).to_numpy()]
+
+
+"""
+4. Streamed
+"""
+
+
+def find_duplicates(chunks, subset=None, max_keys=MAX_KEYS,
+                    spill_dir=None):
+    """
+    Return the positions (counted over all the chunks) of the
+    duplicate rows. Candidates are verified with a second 64-bit
+    hash, since the rows are not kept.
+    """
+    finder = DuplicateFinder(subset, max_keys=max_keys,
+                             spill_dir=spill_dir)
+    for chunk in chunks:
+        finder.update(chunk)
+
+    return finder.result()[0]
+
+
+def drop_duplicates_chunks(make_chunks, subset=None, **options):
+    """
+    'make_chunks' is a function which returns the chunks (for
+    example lambda: pd.read_csv(path, chunksize=1_000_000)). It is
+    called twice: once to find the duplicates, then once more to
+    yield every chunk without them.
+    """
+    duplicate_positions = find_duplicates(make_chunks(), subset,
+                                          **options)
+    start = 0
+    for chunk in make_chunks():
+        end = start + len(chunk)
+        low, high = np.searchsorted(duplicate_positions, [start, end])
+        drop = np.zeros(len(chunk), dtype=bool)
+        drop[duplicate_positions[low:high] - start] = True
+        yield chunk[~drop]
+        start = end
+
+
+"""
+5. Benchmark
+
+    Time frame.duplicated() against duplicated() on a frame of
+        'n_rows' rows (100 million by default: that needs a lot of
+        memory), on all the columns and on a subset, with the peak
+        memory each one takes, and check that the results are the
+        same. 'max_keys' is set below 'n_rows', so that duplicated()
+        hashes the rows and spills the hashes to disk, rather than
+        calling frame.duplicated().
+"""
+
+
+def make_duplicates_frame(n_rows, random_state=0):
+    rng = np.random.default_rng(random_state)
+    return pd.DataFrame({
+        'year': rng.integers(2000, 2001, n_rows),
+        'artist': rng.integers(0, n_rows // 4 + 1, n_rows),
+        'track': rng.integers(0, 4, n_rows),
+        'week': rng.integers(1, 77, n_rows),
+        # 0.0 and -0.0, which must count as the same value
+        'change': np.where(rng.random(n_rows) < 0.5, 0.0, -0.0)})
+
+
+def benchmark_duplicated(n_rows=100_000_000, chunk_rows=1_000_000,
+                         max_keys=1_000_000):
+    frame = make_duplicates_frame(n_rows)
+    print('     Rows: ', n_rows)
+
+    for subset in (None, ['artist', 'track']):
+        expected, seconds, peak = measure(
+            lambda: frame.duplicated(subset))
+        print('     frame.duplicated(' + str(subset) + '): ',
+              round(seconds, 2), 's, peak', peak // 2 ** 20, 'MB')
+
+        result, seconds, peak = measure(
+            lambda: duplicated(frame, subset, chunk_rows=chunk_rows,
+                               max_keys=max_keys))
+        print('     duplicated(max_keys=' + str(max_keys) + '):',
+              round(seconds, 2), 's, peak', peak // 2 ** 20, 'MB')
+
+        pd.testing.assert_series_equal(result, expected)
+
+
+# benchmark_duplicated()
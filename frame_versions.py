@@ -0,0 +1,285 @@
+"""
+Frame Versions
+
+    The tutorial scripts keep every step of the cleaning in a NEW
+        variable (drop_extra, drop_NaNs, iter_cols, ..., df_2,
+        df_3), so that we can ROLLBACK to an earlier state of the
+        dataframe if we later discover a mistake.
+
+    That is good advice, but with big data every new variable is
+        a FULL COPY of the data: ten steps, ten copies.
+
+    Most steps only touch a few columns, or only drop some rows.
+        FrameHistory keeps every step, but only stores what the
+        step actually changed:
+
+        - a column which did not change is SHARED with the
+          previous version (no copy),
+        - a column which only lost some rows is shared too, and
+          the version stores the row positions it keeps (one
+          small integer array for the whole version),
+        - only new or modified columns are stored as new data.
+
+    Example:
+
+        history = FrameHistory(data_import, 'data_import')
+        history.apply('drop_extra',
+                      lambda df: df.drop(columns=['Unnamed: 9']))
+        history.apply('drop_NaNs',
+                      lambda df: df[df['Row Type'].notna()])
+
+        drop_extra = history['drop_extra']     # rollback
+        print(history.memory_usage())          # bytes per version
+        history.evict(budget_bytes=500_000_000)
+
+    Note:
+        Stored columns are never handed out directly: every
+        version we get back is a fresh DataFrame, so changing it
+        (even with 'inplace=True') can never change the history.
+"""
+import numpy as np
+import pandas as pd
+
+
+class ColumnRef:
+    """
+    One column of one version: a stored array, plus the positions
+    of the rows of that array which the version keeps (None means
+    all of them).
+    """
+
+    def __init__(self, values, positions=None):
+        self.values = values
+        self.positions = positions
+
+    def materialize(self, copy=True):
+        if self.positions is None:
+            return self.values.copy() if copy else self.values
+
+        return self.values.take(self.positions)
+
+    def select(self, positions, composed):
+        """
+        Return a ColumnRef which keeps only 'positions' of this
+        one. 'composed' caches the composed position arrays, so
+        that all columns of a version share one array.
+        """
+        if self.positions is None:
+            return ColumnRef(self.values, positions)
+
+        key = id(self.positions)
+        if key not in composed:
+            composed[key] = self.positions[positions]
+
+        return ColumnRef(self.values, composed[key])
+
+
+class FrameVersion:
+    def __init__(self, name, columns, index, description):
+        self.name = name
+        self.columns = columns      # column name -> ColumnRef
+        self.index = index          # ColumnRef over an Index
+        self.description = description
+
+
+def nbytes(values):
+    if isinstance(values, pd.Index):
+        return int(values.memory_usage(deep=True))
+
+    return int(values.nbytes)
+
+
+class FrameHistory:
+    def __init__(self, frame, name='original'):
+        self.versions = {}
+        self.commit(name, frame, 'original data')
+
+    def __getitem__(self, name):
+        return self.checkout(name)
+
+    def __contains__(self, name):
+        return name in self.versions
+
+    def names(self):
+        return list(self.versions)
+
+    def latest(self):
+        return self.names()[-1]
+
+    def checkout(self, name=None):
+        """
+        Rebuild the DataFrame of version 'name' (the latest version
+        by default).
+        """
+        version = self.versions[name or self.latest()]
+        index = version.index.materialize()
+        return pd.DataFrame(
+            {column: ref.materialize()
+             for column, ref in version.columns.items()},
+            index=index)
+
+    def apply(self, name, transformation, base=None,
+              description=None):
+        """
+        Run 'transformation' (a function which takes a DataFrame
+        and returns a DataFrame) on version 'base' (the latest
+        version by default), then record its result as version
+        'name'. Return the new DataFrame.
+        """
+        base = base or self.latest()
+        result = transformation(self.checkout(base))
+
+        if description is None:
+            description = getattr(transformation, '__name__',
+                                  repr(transformation))
+
+        self.commit(name, result, description, base)
+        return result
+
+    def commit(self, name, frame, description='', base=None):
+        """
+        Record 'frame' as version 'name', sharing every column
+        that it has in common with version 'base' (the latest
+        version by default).
+        """
+        if name in self.versions:
+            raise ValueError('there is already a version called '
+                             + repr(name))
+
+        if not self.versions:
+            parent = None
+        else:
+            parent = self.versions[base or self.latest()]
+
+        if parent is None:
+            index = ColumnRef(frame.index)
+            columns = {column: ColumnRef(frame[column].array.copy())
+                       for column in frame.columns}
+        else:
+            index, columns = self.diff(parent, frame)
+
+        self.versions[name] = FrameVersion(name, columns, index,
+                                           description)
+
+    def diff(self, parent, frame):
+        parent_index = parent.index.materialize()
+        composed = {}
+
+        if parent_index.equals(frame.index):
+            positions = None
+            index = parent.index
+        else:
+            positions = row_positions(parent_index, frame.index)
+            if positions is None:
+                index = ColumnRef(frame.index)
+            else:
+                index = parent.index.select(positions, composed)
+
+        # columns which disappeared may only have been renamed
+        renamed = [column for column in parent.columns
+                   if column not in frame.columns]
+
+        columns = {}
+        for column in frame.columns:
+            values = frame[column]
+            candidates = [column] if column in parent.columns else []
+            candidates += renamed
+
+            for candidate in candidates:
+                ref = parent.columns[candidate]
+                if positions is not None:
+                    ref = ref.select(positions, composed)
+
+                if same_values(ref, values):
+                    columns[column] = ref
+                    break
+            else:
+                columns[column] = ColumnRef(values.array.copy())
+
+        return index, columns
+
+    def memory_usage(self):
+        """
+        Return a DataFrame with one row per version:
+            new_bytes    - data first stored by this version
+            shared_bytes - data this version shares with earlier
+                           versions
+            total_bytes  - all the data this version refers to
+        """
+        seen = set()
+        rows = []
+
+        for version in self.versions.values():
+            refs = list(version.columns.values()) + [version.index]
+            new_bytes = shared_bytes = 0
+            version_seen = set()
+
+            for ref in refs:
+                for array in (ref.values, ref.positions):
+                    if array is None or id(array) in version_seen:
+                        continue
+                    version_seen.add(id(array))
+
+                    if id(array) in seen:
+                        shared_bytes += nbytes(array)
+                    else:
+                        seen.add(id(array))
+                        new_bytes += nbytes(array)
+
+            rows.append({'version': version.name,
+                         'description': version.description,
+                         'new_bytes': new_bytes,
+                         'shared_bytes': shared_bytes,
+                         'total_bytes': new_bytes + shared_bytes})
+
+        return pd.DataFrame(rows).set_index('version')
+
+    def total_bytes(self):
+        return int(self.memory_usage()['new_bytes'].sum())
+
+    def drop(self, name):
+        del self.versions[name]
+
+    def evict(self, budget_bytes):
+        """
+        Drop the OLDEST versions until the whole history fits in
+        'budget_bytes'. The latest version is never dropped.
+        Return the names of the dropped versions.
+
+        Note that dropping a version only frees the data which no
+        remaining version shares.
+        """
+        evicted = []
+        while (len(self.versions) > 1
+               and self.total_bytes() > budget_bytes):
+            oldest = self.names()[0]
+            self.drop(oldest)
+            evicted.append(oldest)
+
+        return evicted
+
+
+def row_positions(parent_index, index):
+    """
+    Return the positions of the rows of 'index' in 'parent_index',
+    or None if 'index' is not made of rows of 'parent_index'.
+    """
+    if not parent_index.is_unique:
+        return None
+
+    positions = parent_index.get_indexer(index)
+    if (positions < 0).any():
+        return None
+
+    return positions.astype(np.intp)
+
+
+def same_values(ref, values):
+    if len(values) != (len(ref.values) if ref.positions is None
+                       else len(ref.positions)):
+        return False
+    if ref.values.dtype != values.array.dtype:
+        return False
+
+    stored = pd.Series(ref.materialize(copy=False))
+    return stored.equals(pd.Series(values.array))
@@ -0,0 +1,1589 @@
+"""
+Loaders
+
+    Helpers for LOADING data files, shared by the tutorial
+        scripts. read_csv() below takes the same arguments as
+        pd.read_csv(), so it can be used in its place.
+
+    1. Encodings
+
+        Section 1a of 'Data Cleaning.py' loads unclean_data.csv
+            by trying encodings by hand: latin1, utf-8,
+            ISO-8859-1 ...
+
+        read_csv() finds the encoding by itself when we do not
+            give one:
+
+            - it looks at the first bytes of the file only (64 KB
+              by default), never at the whole file,
+            - it remembers the answer in a small cache file, keyed
+              by the path, size and modification time of the
+              file, so the next load of the same file skips the
+              detection,
+            - it then checks the rest of the file WHILE pandas
+              reads it. If a later byte does not fit the detected
+              encoding, the rest of the file is decoded with the
+              next encoding of ENCODINGS which fits (cp1252, then
+              latin1), so the file is still read only ONCE. The
+              cache is left alone, so every load of the file
+              decodes it the same way.
+
+    2. Big files, in parallel
+
+        pd.read_csv() parses a file on ONE core. For big local
+            files, read_csv() cuts the file into byte ranges that
+            end at a newline, parses the ranges at the same time
+            (threads by default: pandas' tokenizer releases the
+            GIL; or processes), then concatenates them once.
+
+        'usecols' and 'dtype' are passed to every range, so
+            unwanted columns are never converted and the wanted
+            ones get their final type straight away.
+
+        iter_csv_chunks() gives the same ranges one DataFrame at
+            a time (parsed ahead in the background), for files too
+            big to hold in memory.
+
+        Note: like pyarrow's parallel reader, this assumes that
+            no quoted value contains a newline. Pass parallel=False
+            for such files.
+
+    3. A columnar cache
+
+        Every run of a script parses its .csv files again, from
+            scratch. With pyarrow installed, read_csv() keeps the
+            parsed DataFrame of every local file in a Feather
+            (Arrow) file, and the next load with the same options
+            is served from it, memory-mapped: no parsing at all.
+
+        - The cache key is a hash of the file CONTENT plus the
+          read_csv() options, so editing the file or changing an
+          option gives a new entry. (The content hash itself is
+          remembered by path, size and modification time, so an
+          unchanged file is not hashed again.)
+        - The cache folder is kept under a size limit: the least
+          recently used entries are deleted first.
+        - cache=False turns it off for one call.
+
+    4. Remote files
+
+        read_csv() on an http(s) URL downloads the file ONCE into
+            the cache folder. Later loads ask the server whether
+            the file changed (ETag / Last-Modified) at most once a
+            day, and read the local copy otherwise. Without a
+            network, the local copy is used as it is.
+
+        fetch_all(urls) downloads many files AT THE SAME TIME (one
+            thread each, sharing a pool of kept-alive connections
+            per server). The same URL given twice is fetched once,
+            and unchanged files are not downloaded again (the
+            server answers '304 Not Modified'). The read_csv() calls
+            that follow are served from the fresh local copies:
+
+                fetch_all([confirmed_url, recovered_url, death_url])
+                df_confirmed = read_csv(confirmed_url)
+
+    5. Fixing the header afterwards
+
+        A file without a header row is easily read with its first
+            data row as the header. reheader() gives the frame its
+            real column names and puts that row back as data: no
+            second download, no second parse. read_csv() keeps the
+            raw fields of the first line for it in
+            frame.attrs['header_row'].
+
+    6. Sentinels
+
+        Some files write a missing value as '?', '-' or 999.
+            Replacing them AFTER parsing (df.replace('?', np.nan))
+            copies every column and leaves the columns which held
+            them as text. read_csv(path, sentinels='?') makes them
+            NaN WHILE parsing (pandas' 'na_values'), so those
+            columns come out numeric straight away. Sentinels can
+            be given for every column, or per column:
+
+                read_csv(path, sentinels='?')
+                read_csv(path, sentinels={'price': ['?', '-']})
+
+    7. Clean column names, before parsing
+
+        read_csv(path, column_names=ColumnNames(...)) reads the
+            header line only, cleans the names up (case, spaces,
+            punctuation, aliases: see column_names.py), and lets
+            'usecols', 'dtype', 'parse_dates' ... use the clean
+            names. So only the wanted columns are ever parsed,
+            and the frame comes out with the clean names.
+"""
+import codecs
+import contextlib
+import hashlib
+import http.client
+import http.server
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from column_names import ColumnNames
+
+try:
+    import pyarrow
+    import pyarrow.feather as feather
+except ImportError:
+    pyarrow = feather = None
+
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache',
+                         'data-manipulation')
+
+SAMPLE_BYTES = 64 * 1024
+
+# tried in this order; latin1 can decode any byte, so it is last
+ENCODINGS = ('utf-8', 'cp1252', 'latin1')
+
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+
+CHUNK_BYTES = 32 * 1024 * 1024
+
+COLUMNAR_CACHE_BYTES = 4 * 1024 ** 3
+
+# seconds before a downloaded file is checked against the server
+HTTP_MAX_AGE = 24 * 60 * 60
+
+HTTP_TIMEOUT = 30
+
+HTTP_MAX_REDIRECTS = 5
+
+# read_csv() options after which the first line of the file is no
+# longer the first row of the frame
+HEADER_OPTIONS = ('names', 'header', 'usecols', 'index_col',
+                  'skiprows', 'chunksize', 'iterator')
+
+# the strings that pd.read_csv() reads as NaN by default
+NA_STRINGS = ('', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN',
+              '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA',
+              'NULL', 'NaN', 'None', 'n/a', 'nan', 'null')
+
+# read_csv() options that need the whole file in one piece
+SERIAL_OPTIONS = ('skiprows', 'skipfooter', 'nrows', 'chunksize',
+                  'iterator', 'index_col', 'comment', 'header',
+                  'converters', 'lineterminator', 'engine',
+                  'memory_map', 'compression')
+
+# encodings in which every b'\n' byte is a newline
+NEWLINE_SAFE = ('utf-8', 'utf-8-sig', 'cp1252', 'latin1', 'ascii',
+                'iso-8859-1')
+
+BOMS = ((codecs.BOM_UTF8, 'utf-8-sig'),
+        (codecs.BOM_UTF16_LE, 'utf-16'),
+        (codecs.BOM_UTF16_BE, 'utf-16'))
+
+
+"""
+1. Encoding detection
+"""
+
+
+def file_key(path):
+    stat = os.stat(path)
+    return '|'.join([os.path.abspath(path), str(stat.st_size),
+                     str(stat.st_mtime_ns)])
+
+
+class EncodingCache:
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.path = os.path.join(cache_dir, 'encodings.json')
+
+    def load(self):
+        try:
+            with open(self.path) as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, path):
+        return self.load().get(file_key(path))
+
+    def set(self, path, encoding):
+        entries = self.load()
+        entries[file_key(path)] = encoding
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as cache_file:
+            json.dump(entries, cache_file)
+        os.replace(temporary, self.path)
+
+
+def sniff_encoding(sample, encodings=ENCODINGS):
+    """
+    Return the first encoding in 'encodings' which can decode the
+    bytes in 'sample'. A byte order mark decides on its own.
+
+    The sample may end in the middle of a character, so it is
+    decoded with final=False.
+    """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    for encoding in encodings:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            decoder.decode(sample, final=False)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+
+    return encodings[-1]
+
+
+def detect_encoding(path, sample_bytes=SAMPLE_BYTES,
+                    cache=None, encodings=ENCODINGS):
+    """
+    Return the encoding of the file at 'path', from the cache when
+    the file has not changed, else from its first 'sample_bytes'.
+    """
+    cache = cache or EncodingCache()
+    encoding = cache.get(path)
+
+    if encoding is None:
+        with open(path, 'rb') as data_file:
+            encoding = sniff_encoding(data_file.read(sample_bytes),
+                                      encodings)
+        cache.set(path, encoding)
+
+    return encoding
+
+
+def fallback_encodings(encoding, encodings=ENCODINGS):
+    """
+    The encodings to try, in order, when 'encoding' turns out to be
+    wrong: those after it in 'encodings' (all the others, if it is
+    not one of them).
+    """
+    names = [codecs.lookup(name).name for name in encodings]
+    name = codecs.lookup(encoding).name
+    if name in names:
+        return list(encodings[names.index(name) + 1:])
+
+    return list(encodings)
+
+
+"""
+2. Checking the rest of the file while it is read
+
+    CheckedTextFile is a text file object that pandas can read
+        from. It reads the file (a path, or a binary file object)
+        in blocks and decodes each block with the detected
+        encoding. If a block cannot be decoded, everything from
+        the first bad byte onwards is decoded with the next
+        encoding of ENCODINGS which can.
+
+    The parallel reader does the same for each byte range on its
+        own (see parse_range()).
+"""
+
+
+class CheckedTextFile:
+    def __init__(self, path, encoding, block_bytes=1024 * 1024):
+        self.raw = (open(path, 'rb') if isinstance(path, (str, os.PathLike))
+                    else path)
+        self.encoding = encoding
+        self.block_bytes = block_bytes
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.buffer = ''
+
+    def decode(self, data, final):
+        try:
+            return self.decoder.decode(data, final)
+        except UnicodeDecodeError as error:
+            fallbacks = fallback_encodings(self.encoding)
+            if not fallbacks:
+                raise
+
+            # the error position counts the bytes the decoder was
+            # still holding from the previous block too
+            data = self.decoder.getstate()[0] + data
+            text = codecs.decode(data[:error.start], self.encoding)
+
+            self.encoding = fallbacks[0]
+            self.decoder = codecs.getincrementaldecoder(self.encoding)()
+            return text + self.decode(data[error.start:], final)
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            data = self.raw.read(self.block_bytes)
+            self.buffer += self.decode(data, final=not data)
+            if not data:
+                break
+
+        if size < 0:
+            size = len(self.buffer)
+
+        text, self.buffer = self.buffer[:size], self.buffer[size:]
+        return text
+
+    def __iter__(self):
+        # pandas' python engine reads line by line
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def readline(self):
+        while '\n' not in self.buffer:
+            data = self.raw.read(self.block_bytes)
+            self.buffer += self.decode(data, final=not data)
+            if not data:
+                break
+
+        end = self.buffer.find('\n') + 1 or len(self.buffer)
+        line, self.buffer = self.buffer[:end], self.buffer[end:]
+        return line
+
+    def close(self):
+        self.raw.close()
+
+
+def is_local_file(path):
+    return isinstance(path, (str, os.PathLike)) and os.path.isfile(path)
+
+
+def is_remote_file(path):
+    return (isinstance(path, str)
+            and urllib.parse.urlparse(path).scheme in ('http', 'https'))
+
+
+def read_csv(path, encoding=None, encoding_cache=None, parallel=None,
+             workers=None, use_processes=False, cache=True,
+             cache_dir=CACHE_DIR, http_cache=True, sentinels=None,
+             column_names=None, **options):
+    """
+    Drop-in for pd.read_csv().
+
+    - finds the encoding of local files by itself when 'encoding'
+      is not given (section 1),
+    - parses big local files in parallel (section 3).
+      parallel=None decides by itself (files of 64 MB or more, with
+      no option that needs the file in one piece), True forces it,
+      False turns it off,
+    - serves repeated loads from the columnar cache (section 4),
+    - downloads http(s) files once, into the HTTP cache
+      (section 5),
+    - keeps the raw fields of the header line, for reheader()
+      (section 6),
+    - reads the 'sentinels' (a value, a list of values, or a dict
+      {column: values}) as NaN, on top of pandas' own
+      'na_values' (section 6),
+    - cleans up the column names with 'column_names' (a
+      ColumnNames, or True for the default one), and lets the
+      other options use the clean names (section 7).
+    """
+    if sentinels is not None:
+        options['na_values'] = with_sentinels(options.get('na_values'),
+                                              sentinels)
+    if (http_cache and is_remote_file(path)
+            and 'storage_options' not in options):
+        path = HTTPCache(cache_dir).fetch(path)
+
+    if column_names is True:
+        column_names = ColumnNames()
+
+    if not is_local_file(path):
+        frame = pd.read_csv(path, encoding=encoding, **options)
+        if column_names is not None:
+            frame = column_names.rename(frame)
+        return frame
+
+    renames = None
+    if column_names is not None:
+        options, renames = with_raw_names(
+            path, encoding or detect_encoding(path, cache=encoding_cache),
+            column_names, options)
+
+    columnar = key = None
+    frame = None
+    if cache and ColumnarCache.can_cache(options):
+        columnar = ColumnarCache(cache_dir)
+        key = columnar.key(path, dict(options, encoding=encoding))
+        frame = columnar.load(
+            key, options.get('dtype_backend') == 'pyarrow')
+
+    if frame is None:
+        frame = parse_csv(path, encoding, encoding_cache, parallel,
+                          workers, use_processes, **options)
+        if columnar is not None:
+            columnar.store(key, frame)
+
+    if not any(option in options for option in HEADER_OPTIONS):
+        frame.attrs['header_row'] = header_fields(
+            path, encoding or detect_encoding(path, cache=encoding_cache),
+            options)
+        if sentinels is not None:
+            frame.attrs['sentinels'] = sentinels
+
+    if renames is not None:
+        frame = renamed(frame, renames)
+
+    return frame
+
+
+def parse_csv(path, encoding=None, encoding_cache=None, parallel=None,
+              workers=None, use_processes=False, **options):
+    detected = encoding is None
+    if detected:
+        encoding = detect_encoding(path, cache=encoding_cache)
+
+    if parallel is None:
+        parallel = (os.path.getsize(path) >= PARALLEL_MIN_BYTES
+                    and can_split(encoding, options))
+    if parallel:
+        return read_csv_parallel(path, encoding, workers,
+                                 use_processes, checked=detected,
+                                 **options)
+
+    if not detected:
+        return pd.read_csv(path, encoding=encoding, **options)
+
+    # the sample fitted 'encoding', but a later byte may not
+    text_file = CheckedTextFile(path, encoding)
+    if options.get('chunksize') or options.get('iterator'):
+        return CheckedReader(pd.read_csv(text_file, **options),
+                             text_file)
+
+    try:
+        return pd.read_csv(text_file, **options)
+    finally:
+        text_file.close()
+
+
+class CheckedReader:
+    """
+    The TextFileReader of pd.read_csv(CheckedTextFile, chunksize=n)
+    (or iterator=True), which also closes the file when it is
+    closed, exhausted, or used in a 'with' block.
+    """
+
+    def __init__(self, reader, text_file):
+        self.reader = reader
+        self.text_file = text_file
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.reader)
+        except StopIteration:
+            self.close()
+            raise
+
+    def __getattr__(self, name):
+        # read(), get_chunk(), chunksize ... of the TextFileReader
+        return getattr(self.reader, name)
+
+    def close(self):
+        self.reader.close()
+        self.text_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+"""
+3. Parallel parsing of byte ranges
+"""
+
+
+def can_split(encoding, options):
+    if codecs.lookup(encoding).name not in [
+            codecs.lookup(name).name for name in NEWLINE_SAFE]:
+        return False
+
+    return not any(options.get(name) is not None
+                   for name in SERIAL_OPTIONS)
+
+
+def byte_ranges(path, start, chunk_bytes=CHUNK_BYTES):
+    """
+    Cut the file at 'path', from byte 'start' on, into ranges of
+    about 'chunk_bytes' bytes, each ending just after a newline.
+    """
+    size = os.path.getsize(path)
+    ranges = []
+
+    with open(path, 'rb') as data_file:
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                data_file.seek(end)
+                end += len(data_file.readline())
+            ranges.append((start, end))
+            start = end
+
+    return ranges
+
+
+def read_header(path, encoding, options):
+    """
+    Return (column names, byte where the data starts).
+    """
+    with open(path, 'rb') as data_file:
+        first_line = data_file.readline()
+
+    if options.get('names') is not None:
+        return list(options['names']), 0
+
+    header = pd.read_csv(io.BytesIO(first_line), encoding=encoding,
+                         nrows=0, **without(options, 'usecols',
+                                            'dtype'))
+    return list(header.columns), len(first_line)
+
+
+def without(options, *names):
+    return {name: value for name, value in options.items()
+            if name not in names}
+
+
+def parse_range(path, start, end, names, encoding, options,
+                checked=False):
+    """
+    Parse the bytes from 'start' to 'end' of the file. 'checked':
+    'encoding' was detected, not given, so a byte it cannot decode
+    switches the rest of the range to the next encoding (the
+    block is already in memory: nothing is read again).
+    """
+    with open(path, 'rb') as data_file:
+        data_file.seek(start)
+        block = data_file.read(end - start)
+
+    options = dict(options, header=None, names=names)
+    try:
+        return pd.read_csv(io.BytesIO(block), encoding=encoding,
+                           **options)
+    except UnicodeDecodeError:
+        if not checked:
+            raise
+
+    text_file = CheckedTextFile(io.BytesIO(block), encoding)
+    return pd.read_csv(text_file, **options)
+
+
+def make_executor(workers, use_processes):
+    workers = workers or os.cpu_count() or 1
+    if use_processes:
+        return ProcessPoolExecutor(max_workers=workers), workers
+
+    return ThreadPoolExecutor(max_workers=workers), workers
+
+
+def iter_csv_chunks(path, encoding=None, chunk_bytes=CHUNK_BYTES,
+                    workers=None, use_processes=False, **options):
+    """
+    Yield the file at 'path' as DataFrames of about 'chunk_bytes'
+    bytes each, in file order. Up to 'workers' ranges are parsed
+    ahead in the background.
+    """
+    checked = encoding is None
+    encoding = encoding or detect_encoding(path)
+    names, start = read_header(path, encoding, options)
+    ranges = byte_ranges(path, start, chunk_bytes)
+
+    executor, workers = make_executor(workers, use_processes)
+    with executor:
+        pending = []
+        for range_start, range_end in ranges:
+            pending.append(executor.submit(
+                parse_range, path, range_start, range_end, names,
+                encoding, options, checked))
+
+            if len(pending) > workers:
+                yield pending.pop(0).result()
+
+        for future in pending:
+            yield future.result()
+
+
+def read_csv_parallel(path, encoding=None, workers=None,
+                      use_processes=False, checked=None, **options):
+    """
+    Parse the file at 'path' in byte ranges, at the same time.
+    'checked' (by default: when 'encoding' is not given) decodes a
+    range that does not fit 'encoding' with the next encoding.
+    """
+    if checked is None:
+        checked = encoding is None
+    encoding = encoding or detect_encoding(path)
+    names, start = read_header(path, encoding, options)
+    size = os.path.getsize(path) - start
+
+    executor, workers = make_executor(workers, use_processes)
+    # a few ranges per worker, so that no worker waits for a slow one
+    chunk_bytes = max(size // (workers * 4), 1024 * 1024)
+    ranges = byte_ranges(path, start, chunk_bytes)
+
+    with executor:
+        parts = list(executor.map(
+            parse_range, [path] * len(ranges),
+            [range_start for range_start, _ in ranges],
+            [range_end for _, range_end in ranges],
+            [names] * len(ranges), [encoding] * len(ranges),
+            [options] * len(ranges), [checked] * len(ranges)))
+
+    if not parts:
+        return pd.read_csv(path, encoding=encoding, **options)
+
+    return concat_parts(parts)
+
+
+def concat_parts(parts):
+    """
+    pd.concat() the parsed ranges. A 'category' column whose ranges
+    found different categories would come out as 'object', so such
+    columns are joined with union_categoricals() instead.
+    """
+    result = pd.concat(parts, ignore_index=True)
+
+    for column in parts[0].columns:
+        if (isinstance(parts[0][column].dtype, pd.CategoricalDtype)
+                and not isinstance(result[column].dtype,
+                                   pd.CategoricalDtype)):
+            result[column] = pd.api.types.union_categoricals(
+                [part[column] for part in parts])
+
+    return result
+
+
+"""
+4. Columnar cache
+"""
+
+
+class ColumnarCache:
+    def __init__(self, cache_dir=CACHE_DIR,
+                 max_bytes=COLUMNAR_CACHE_BYTES):
+        self.folder = os.path.join(cache_dir, 'columnar')
+        self.index_path = os.path.join(self.folder, 'index.json')
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def can_cache(options):
+        """
+        Chunked reads are not cached, and neither are options which
+        cannot be written down the same way every run (functions).
+        """
+        if feather is None:
+            return False
+        if options.get('chunksize') or options.get('iterator'):
+            return False
+
+        return not any(callable(value) for value in options.values())
+
+    def read_index(self):
+        try:
+            with open(self.index_path) as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError):
+            return {'sources': {}, 'entries': {}}
+
+    def write_index(self, index):
+        os.makedirs(self.folder, exist_ok=True)
+        temporary = self.index_path + '.tmp'
+        with open(temporary, 'w') as index_file:
+            json.dump(index, index_file)
+        os.replace(temporary, self.index_path)
+
+    def content_hash(self, path, index):
+        stat = os.stat(path)
+        source = index['sources'].get(os.path.abspath(path))
+        if (source and source['size'] == stat.st_size
+                and source['mtime_ns'] == stat.st_mtime_ns):
+            return source['hash']
+
+        digest = hashlib.blake2b(digest_size=20)
+        with open(path, 'rb') as data_file:
+            for block in iter(lambda: data_file.read(1 << 20), b''):
+                digest.update(block)
+
+        index['sources'][os.path.abspath(path)] = {
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'hash': digest.hexdigest()}
+        self.write_index(index)
+        return digest.hexdigest()
+
+    def key(self, path, options):
+        index = self.read_index()
+        options_text = repr(sorted(options.items()))
+        return hashlib.blake2b(
+            (self.content_hash(path, index) + options_text).encode(),
+            digest_size=20).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.folder, key + '.feather')
+
+    def load(self, key, arrow_dtypes=False):
+        """
+        The frame stored under 'key' (None if there is none).
+        'arrow_dtypes': the frame was parsed with
+        dtype_backend='pyarrow', so every column comes back as a
+        pd.ArrowDtype, as a fresh parse gives it.
+        """
+        index = self.read_index()
+        if key not in index['entries']:
+            return None
+
+        try:
+            table = feather.read_table(self.entry_path(key),
+                                       memory_map=True)
+        except (OSError, pyarrow.ArrowException):
+            return None
+
+        index['entries'][key]['last_used'] = time.time()
+        self.write_index(index)
+        if arrow_dtypes:
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+        return table.to_pandas()
+
+    def store(self, key, frame):
+        os.makedirs(self.folder, exist_ok=True)
+        temporary = self.entry_path(key) + '.tmp'
+
+        # uncompressed, so that the file can be memory-mapped
+        try:
+            feather.write_feather(frame, temporary,
+                                  compression='uncompressed')
+        except (TypeError, ValueError, pyarrow.ArrowException):
+            # e.g. a column holding both numbers and text
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            return False
+
+        os.replace(temporary, self.entry_path(key))
+
+        index = self.read_index()
+        index['entries'][key] = {
+            'bytes': os.path.getsize(self.entry_path(key)),
+            'last_used': time.time()}
+        self.evict(index)
+        self.write_index(index)
+        return True
+
+    def evict(self, index):
+        entries = index['entries']
+        total = sum(entry['bytes'] for entry in entries.values())
+
+        for key in sorted(entries, key=lambda k: entries[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= entries.pop(key)['bytes']
+            if os.path.exists(self.entry_path(key)):
+                os.remove(self.entry_path(key))
+
+
+"""
+5. HTTP cache
+
+    One file per URL in CACHE_DIR/http, next to a small .json file
+        with its ETag and Last-Modified headers. The file keeps the
+        extension of the URL, so that pandas still infers the
+        compression (.zip, .gz ...) from it.
+"""
+
+
+class HTTPCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_age=HTTP_MAX_AGE):
+        self.folder = os.path.join(cache_dir, 'http')
+        self.max_age = max_age
+
+    def paths(self, url):
+        key = hashlib.blake2b(url.encode(), digest_size=20).hexdigest()
+        extension = os.path.splitext(urllib.parse.urlparse(url).path)[1]
+        body_path = os.path.join(self.folder, key + extension)
+        return body_path, os.path.join(self.folder, key + '.json')
+
+    def read_meta(self, meta_path):
+        try:
+            with open(meta_path) as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return {}
+
+    def fetch(self, url, max_age=None, pool=None):
+        """
+        Return the path of the local copy of 'url', downloading it
+        only when there is no copy yet, or when the copy is older
+        than 'max_age' seconds AND the server says it changed.
+        max_age=0 always asks the server.
+
+        'pool': a ConnectionPool to send the request through (by
+        default, urllib opens a new connection).
+        """
+        max_age = self.max_age if max_age is None else max_age
+        body_path, meta_path = self.paths(url)
+        meta = self.read_meta(meta_path)
+        have_copy = bool(meta) and os.path.exists(body_path)
+
+        if have_copy and time.time() - meta['checked'] < max_age:
+            return body_path
+
+        headers = {}
+        if have_copy and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if have_copy and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            with self.open(url, headers, pool) as response:
+                self.save(response, body_path)
+                meta = {'url': url,
+                        'etag': response.headers.get('ETag'),
+                        'last_modified':
+                            response.headers.get('Last-Modified')}
+        except urllib.error.HTTPError as error:
+            # 304 Not Modified: the copy we have is still good
+            if error.code != 304 or not have_copy:
+                raise
+        except (urllib.error.URLError, OSError):
+            # offline: use the copy we have, however old
+            if not have_copy:
+                raise
+            return body_path
+
+        meta['checked'] = time.time()
+        with open(meta_path, 'w') as meta_file:
+            json.dump(meta, meta_file)
+
+        return body_path
+
+    def open(self, url, headers, pool=None):
+        if pool is not None:
+            return pool.open(url, headers)
+
+        request = urllib.request.Request(url, headers=headers)
+        return urllib.request.urlopen(request, timeout=HTTP_TIMEOUT)
+
+    def save(self, response, body_path):
+        os.makedirs(self.folder, exist_ok=True)
+        temporary = body_path + '.tmp'
+        with open(temporary, 'wb') as body_file:
+            for block in iter(lambda: response.read(1 << 20), b''):
+                body_file.write(block)
+        os.replace(temporary, body_path)
+
+
+class ConnectionPool:
+    """
+    Kept-alive HTTP connections, per (scheme, host), shared by
+    threads: a request takes an idle connection to its host (or
+    opens one), and gives it back once the response is read.
+    """
+
+    def __init__(self, timeout=HTTP_TIMEOUT):
+        self.timeout = timeout
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def connect(self, server):
+        scheme, host = server
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, timeout=self.timeout)
+        return http.client.HTTPConnection(host, timeout=self.timeout)
+
+    def take(self, server):
+        with self.lock:
+            connections = self.idle.get(server)
+            if connections:
+                return connections.pop(), True
+
+        return self.connect(server), False
+
+    def give_back(self, server, connection):
+        with self.lock:
+            self.idle.setdefault(server, []).append(connection)
+
+    def request(self, server, target, headers):
+        connection, reused = self.take(server)
+        try:
+            connection.request('GET', target, headers=headers)
+            return connection, connection.getresponse()
+        except (http.client.HTTPException, ConnectionError):
+            connection.close()
+            if not reused:
+                raise
+
+        # the server closed the idle connection: open a new one
+        connection = self.connect(server)
+        connection.request('GET', target, headers=headers)
+        return connection, connection.getresponse()
+
+    @contextlib.contextmanager
+    def open(self, url, headers):
+        """
+        GET 'url', following redirects. Like urllib, raise an
+        HTTPError for any answer but 200 (so 304 too).
+        """
+        for _ in range(HTTP_MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(url)
+            server = (parts.scheme, parts.netloc)
+            target = urllib.parse.urlunsplit(('', '') + parts[2:]) or '/'
+            connection, response = self.request(server, target, headers)
+
+            if response.status in (301, 302, 303, 307, 308):
+                response.read()
+                self.release(server, connection, response)
+                url = urllib.parse.urljoin(url,
+                                           response.getheader('Location'))
+                continue
+
+            if response.status != 200:
+                response.read()
+                self.release(server, connection, response)
+                raise urllib.error.HTTPError(url, response.status,
+                                             response.reason,
+                                             response.headers, None)
+            break
+        else:
+            raise urllib.error.URLError('too many redirects: ' + url)
+
+        try:
+            yield response
+        finally:
+            if response.isclosed():
+                self.release(server, connection, response)
+            else:
+                connection.close()
+
+    def release(self, server, connection, response):
+        if response.will_close:
+            connection.close()
+        else:
+            self.give_back(server, connection)
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle.values():
+                for connection in connections:
+                    connection.close()
+            self.idle = {}
+
+
+def fetch_all(urls, max_age=None, workers=None, cache_dir=CACHE_DIR):
+    """
+    Fetch every URL of 'urls' into the HTTP cache, at the same time,
+    and return {url: path of the local copy}. Each URL is fetched
+    once, however many times it is given.
+
+    'max_age': as in HTTPCache.fetch(); max_age=0 asks the server
+        about every file (which only sends the changed ones).
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+
+    cache = HTTPCache(cache_dir)
+    pool = ConnectionPool()
+    try:
+        with ThreadPoolExecutor(workers or min(len(urls), 8)) as executor:
+            paths = executor.map(
+                lambda url: cache.fetch(url, max_age, pool), urls)
+            return dict(zip(urls, paths))
+    finally:
+        pool.close()
+
+
+"""
+6. Fixing the header afterwards
+"""
+
+
+def header_fields(path, encoding, options):
+    """
+    Return the fields of the first line of 'path' as raw strings,
+    exactly as they are in the file.
+    """
+    with open(path, 'rb') as data_file:
+        first_line = data_file.readline()
+
+    fields = pd.read_csv(io.BytesIO(first_line), encoding=encoding,
+                         header=None, dtype=str, keep_default_na=False,
+                         sep=options.get('sep', ','))
+    return fields.iloc[0].tolist()
+
+
+def reheader(frame, names, header_row=None):
+    """
+    Return 'frame' with the column 'names', and with the row that
+    was wrongly read as the header put back as its first row.
+
+    The result is the frame that pd.read_csv(path, names=names)
+    would have given, including the dtypes: a column only stays
+    numeric if the header field is a number too.
+
+    'header_row' (the raw fields of the header line) defaults to
+    frame.attrs['header_row'], which read_csv() fills in. Without
+    it, the column labels are used, which pandas may have changed
+    (a repeated label 'x' becomes 'x.1').
+
+    The sentinels given to read_csv() count as missing in the
+    header row too (a dict of them is looked up by the old label
+    and by the new name).
+    """
+    if header_row is None:
+        header_row = frame.attrs.get(
+            'header_row', [str(column) for column in frame.columns])
+    sentinels = frame.attrs.get('sentinels', ())
+
+    if not len(names) == len(header_row) == frame.shape[1]:
+        raise ValueError('expected {} names and header fields, got {} '
+                         'and {}'.format(frame.shape[1], len(names),
+                                         len(header_row)))
+
+    columns = {}
+    for position, (name, field) in enumerate(zip(names, header_row)):
+        missing = (field in NA_STRINGS
+                   or field in sentinels_of(sentinels, name)
+                   or field in sentinels_of(sentinels,
+                                            frame.columns[position]))
+        columns[name] = with_first_value(None if missing else field,
+                                         frame.iloc[:, position])
+
+    result = pd.DataFrame(columns)
+    result.attrs = {key: value for key, value in frame.attrs.items()
+                    if key != 'header_row'}
+    return result
+
+
+def with_first_value(first, values):
+    values = values.reset_index(drop=True)
+
+    if (pd.api.types.is_numeric_dtype(values)
+            and not pd.api.types.is_bool_dtype(values)):
+        number = pd.to_numeric(pd.Series([first], dtype=object),
+                               errors='coerce')
+        if first is not None and number.isna().all():
+            # text in a numeric column: the whole column is text
+            values = values.astype(object).where(values.notna())
+            values = values.map(str, na_action='ignore')
+            # let pandas pick its text dtype, as the parser does
+            return pd.Series([first] + values.tolist())
+
+        return pd.concat([number, values], ignore_index=True)
+
+    try:
+        first = pd.Series([first], dtype=values.dtype)
+    except (TypeError, ValueError):
+        first = pd.Series([first], dtype=object)
+
+    return pd.concat([first, values], ignore_index=True)
+
+
+"""
+7. Sentinels
+"""
+
+
+def as_list(values):
+    if isinstance(values, (str, int, float)):
+        return [values]
+
+    return list(values)
+
+
+def sentinels_of(sentinels, column):
+    """
+    Return the sentinels which apply to 'column', as strings.
+    """
+    if isinstance(sentinels, dict):
+        sentinels = sentinels.get(column, ())
+
+    return [str(value) for value in as_list(sentinels)]
+
+
+def with_sentinels(na_values, sentinels):
+    """
+    Add 'sentinels' to the 'na_values' option of pd.read_csv().
+    """
+    if na_values is None:
+        if isinstance(sentinels, dict):
+            return {column: as_list(values)
+                    for column, values in sentinels.items()}
+        return as_list(sentinels)
+
+    if isinstance(na_values, dict) != isinstance(sentinels, dict):
+        raise ValueError("'na_values' and 'sentinels' must both be "
+                         "dicts (per column) or both not")
+
+    if not isinstance(sentinels, dict):
+        return as_list(na_values) + as_list(sentinels)
+
+    merged = {column: as_list(values)
+              for column, values in na_values.items()}
+    for column, values in sentinels.items():
+        merged[column] = merged.get(column, []) + as_list(values)
+
+    return merged
+
+
+"""
+8. Clean column names
+"""
+
+
+def pandas_labels(fields):
+    """
+    The labels pandas gives to the header 'fields': a repeated
+    'x' becomes 'x.1', 'x.2' ...
+    """
+    labels = []
+    seen = {}
+    for field in fields:
+        label = field
+        while label in seen:
+            seen[field] += 1
+            label = field + '.' + str(seen[field])
+        seen[label] = 0
+        labels.append(label)
+
+    return labels
+
+
+def with_raw_names(path, encoding, column_names, options):
+    """
+    Return (the options with every column name in them turned back
+    into the name in the file, {name in the file: clean name}).
+    """
+    if options.get('names') is not None:
+        labels = list(options['names'])
+    else:
+        labels = pandas_labels(header_fields(path, encoding, options))
+
+    renames = column_names.mapping(labels)
+    raw = {canonical: label for label, canonical in renames.items()}
+
+    def to_raw(name):
+        if not isinstance(name, str):
+            return name
+        return raw.get(name, raw.get(column_names.canonical(name), name))
+
+    options = dict(options)
+    for option in ('dtype', 'converters', 'na_values'):
+        if isinstance(options.get(option), dict):
+            options[option] = {to_raw(name): value
+                               for name, value
+                               in options[option].items()}
+
+    for option in ('usecols', 'parse_dates', 'index_col'):
+        value = options.get(option)
+        if isinstance(value, str):
+            options[option] = to_raw(value)
+        elif isinstance(value, (list, tuple, set)):
+            options[option] = [to_raw(name) for name in value]
+        elif callable(value) and option == 'usecols':
+            options[option] = (lambda label, usecols=value:
+                               usecols(renames.get(label, label)))
+
+    return options, renames
+
+
+def renamed(frame, renames):
+    frame = frame.rename(columns=renames)
+    frame.index.names = [renames.get(name, name)
+                         for name in frame.index.names]
+    return frame
+
+
+"""
+9. Benchmarks
+
+    9.1 Write a gapminder-like .csv file of about 'size_bytes'
+        bytes (1 GB by default) into a temporary folder, then time
+        pd.read_csv() against the parallel read_csv(), with and
+        without 'usecols'.
+"""
+
+
+def write_big_csv(path, size_bytes):
+    block = pd.DataFrame({
+        'country': ['Afghanistan', 'Albania', 'Algeria',
+                    'Angola'] * 2500,
+        'continent': ['Asia', 'Europe', 'Africa', 'Africa'] * 2500,
+        'year': range(10_000),
+        'lifeExp': [28.801, 55.23, 43.077, 30.015] * 2500,
+        'pop': [8425333, 1282697, 9279525, 4232095] * 2500,
+        'gdpPercap': [779.4453145, 1601.056136, 2449.008185,
+                      3520.610273] * 2500})
+
+    block_text = block.to_csv(index=False, header=False)
+    with open(path, 'w') as data_file:
+        data_file.write(','.join(block.columns) + '\n')
+        written = 0
+        while written < size_bytes:
+            data_file.write(block_text)
+            written += len(block_text)
+
+
+def benchmark_read_csv(size_bytes=1024 ** 3, workers=None):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'big.csv')
+        write_big_csv(path, size_bytes)
+        print('     File size: ', os.path.getsize(path), 'bytes')
+
+        start = time.perf_counter()
+        expected = pd.read_csv(path)
+        serial_time = time.perf_counter() - start
+        print('     pd.read_csv():            ',
+              round(serial_time, 2), 's')
+
+        start = time.perf_counter()
+        result = read_csv(path, parallel=True, workers=workers,
+                          cache=False)
+        parallel_time = time.perf_counter() - start
+        print('     read_csv(parallel=True):  ',
+              round(parallel_time, 2), 's')
+        pd.testing.assert_frame_equal(result, expected)
+        del expected, result
+
+        start = time.perf_counter()
+        read_csv(path, parallel=True, workers=workers, cache=False,
+                 usecols=['country', 'year', 'pop'],
+                 dtype={'country': 'category'})
+        print('     ... with usecols/dtype:   ',
+              round(time.perf_counter() - start, 2), 's')
+
+
+# benchmark_read_csv()
+
+
+"""
+    9.2 Time a first read_csv() (parse, then fill the cache)
+        against a second one (served from the cache), with the
+        default dtypes and with dtype_backend='pyarrow', and check
+        that the cache gives back the frame (and dtypes) of a
+        fresh parse.
+"""
+
+
+def benchmark_columnar_cache(size_bytes=256 * 1024 ** 2):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'big.csv')
+        write_big_csv(path, size_bytes)
+        print('     File size: ', os.path.getsize(path), 'bytes')
+
+        for options in ({}, {'dtype_backend': 'pyarrow'}):
+            print('    ', options or 'default dtypes')
+            for run in ('first load: ', 'second load:'):
+                start = time.perf_counter()
+                frame = read_csv(path, cache_dir=folder, **options)
+                print('     ' + run,
+                      round(time.perf_counter() - start, 2), 's')
+
+            pd.testing.assert_frame_equal(frame,
+                                          pd.read_csv(path, **options))
+
+
+# benchmark_columnar_cache()
+
+
+"""
+    9.3 Write an auto.csv-like file with '?' in some numeric
+        columns, then compare the two ways of getting rid of them:
+
+        - replace, then convert: parse (the '?' columns come out as
+          text), df.replace('?', np.nan), then pd.to_numeric() on
+          the text columns,
+        - sentinels: read_csv(path, sentinels='?').
+
+        Both give the same frame. Peak memory is measured in a
+        second run, with tracemalloc (which sees the numpy arrays
+        pandas allocates, but makes the run much slower).
+"""
+
+
+def write_sentinel_csv(path, n_rows):
+    rows = pd.DataFrame({
+        'symboling': [3, 1, 2, 0] * (n_rows // 4),
+        'normalized-losses': ['?', '164', '158', '?'] * (n_rows // 4),
+        'make': ['audi', 'bmw', 'audi', 'volvo'] * (n_rows // 4),
+        'bore': ['3.47', '3.19', '?', '3.78'] * (n_rows // 4),
+        'stroke': ['2.68', '3.40', '3.40', '?'] * (n_rows // 4),
+        'horsepower': ['111', '?', '102', '115'] * (n_rows // 4),
+        'peak-rpm': ['5000', '5500', '?', '5400'] * (n_rows // 4),
+        'city-mpg': [21, 19, 24, 18] * (n_rows // 4),
+        'price': ['13495', '16500', '?', '17450'] * (n_rows // 4)})
+    rows.to_csv(path, index=False)
+
+
+def measure(function):
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    del result
+
+    tracemalloc.start()
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def replace_then_convert(path):
+    frame = pd.read_csv(path)
+    frame = frame.replace('?', float('nan'))
+    for column in frame.columns:
+        if not pd.api.types.is_numeric_dtype(frame[column]):
+            converted = pd.to_numeric(frame[column], errors='coerce')
+            if converted.notna().sum() == frame[column].notna().sum():
+                frame[column] = converted
+    return frame
+
+
+def benchmark_sentinels(n_rows=1_000_000):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'auto.csv')
+        write_sentinel_csv(path, n_rows)
+        print('     File size: ', os.path.getsize(path), 'bytes')
+
+        results = []
+        for name, function in (
+                ('replace, then convert:', lambda: replace_then_convert(
+                    path)),
+                ('sentinels:            ', lambda: read_csv(
+                    path, sentinels='?', cache=False, parallel=False))):
+            frame, seconds, peak = measure(function)
+            print('     ' + name, round(seconds, 2), 's,',
+                  round(peak / 1024 ** 2), 'MB peak,',
+                  round(frame.memory_usage(deep=True).sum()
+                        / 1024 ** 2), 'MB result')
+            frame.attrs = {}
+            results.append(frame)
+
+        pd.testing.assert_frame_equal(*results)
+
+
+# benchmark_sentinels()
+
+
+"""
+    9.4 Write a wide file (100 columns) whose header names are
+        written in mixed case, then time reading all of it and
+        renaming the columns afterwards (the way of section 2 of
+        'Data Cleaning.py') against read_csv(column_names=...,
+        usecols=...) with 3 clean names.
+"""
+
+
+def benchmark_column_names(n_rows=200_000, n_columns=100):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'wide.csv')
+        header = [('Column ' + str(number)).title() if number % 2
+                  else 'COLUMN_' + str(number)
+                  for number in range(n_columns)]
+        frame = pd.DataFrame(
+            [range(n_columns)] * n_rows, columns=header)
+        frame.to_csv(path, index=False)
+        del frame
+
+        wanted = ['column_1', 'column_2', 'column_50']
+        start = time.perf_counter()
+        expected = pd.read_csv(path)
+        expected.columns = (expected.columns.str.lower()
+                            .str.replace(' ', '_'))
+        expected = expected[wanted]
+        print('     read everything, then rename: ',
+              round(time.perf_counter() - start, 2), 's')
+
+        start = time.perf_counter()
+        result = read_csv(path, column_names=True, usecols=wanted,
+                          cache=False)
+        print('     read_csv(column_names=True):  ',
+              round(time.perf_counter() - start, 2), 's')
+
+        result.attrs = {}
+        pd.testing.assert_frame_equal(result, expected)
+
+
+# benchmark_column_names()
+
+
+"""
+    9.5 Serve 'n_files' files from a local HTTP server which takes
+        'latency' seconds to answer each request (like a far away
+        server), then time reading them one after the other with
+        pd.read_csv(url), the way of 'Data Prep Tutorial for
+        COVID-19.py', against fetch_all(). A second fetch_all()
+        with max_age=0 asks the server about every file, which
+        answers '304 Not Modified': nothing is downloaded again.
+"""
+
+
+class SlowHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.5
+    # a list to append (method, status) to for every request, or None
+    requests = None
+
+    def send_head(self):
+        time.sleep(self.latency)
+        return super().send_head()
+
+    def log_request(self, code='-', size='-'):
+        if self.requests is not None:
+            self.requests.append((self.command, int(code)))
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_folder(folder, latency, requests=None):
+    """
+    Serve 'folder' on a free local port, from a background thread.
+    Return the server (call server.shutdown() when done).
+
+    'requests': a list, which gets (method, status) of every
+    request the server answers.
+    """
+    handler = type('Handler', (SlowHandler,), {'latency': latency,
+                                               'requests': requests})
+    server = http.server.ThreadingHTTPServer(
+        ('127.0.0.1', 0),
+        lambda *args: handler(*args, directory=folder))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def benchmark_fetch_all(n_files=3, size_bytes=4 * 1024 ** 2,
+                        latency=0.5):
+    with tempfile.TemporaryDirectory() as folder:
+        served = os.path.join(folder, 'served')
+        os.makedirs(served)
+        for number in range(n_files):
+            write_big_csv(os.path.join(served, str(number) + '.csv'),
+                          size_bytes)
+
+        server = serve_folder(served, latency)
+        root = 'http://127.0.0.1:' + str(server.server_port) + '/'
+        urls = [root + str(number) + '.csv' for number in range(n_files)]
+        try:
+            start = time.perf_counter()
+            expected = [pd.read_csv(url) for url in urls]
+            print('     pd.read_csv(url), one by one:  ',
+                  round(time.perf_counter() - start, 2), 's')
+
+            start = time.perf_counter()
+            fetch_all(urls + urls[:1], cache_dir=folder)
+            frames = [read_csv(url, cache_dir=folder, cache=False)
+                      for url in urls]
+            print('     fetch_all(), then read_csv():  ',
+                  round(time.perf_counter() - start, 2), 's')
+
+            start = time.perf_counter()
+            fetch_all(urls, max_age=0, cache_dir=folder)
+            print('     fetch_all() again, unchanged:  ',
+                  round(time.perf_counter() - start, 2), 's')
+        finally:
+            server.shutdown()
+
+        for frame, expected_frame in zip(frames, expected):
+            frame.attrs = {}
+            pd.testing.assert_frame_equal(frame, expected_frame)
+
+
+# benchmark_fetch_all()
+
+
+"""
+    9.6 Serve an auto.csv-like file (26 columns, no header line)
+        from a local HTTP server, the way 'Data Wrangling.py'
+        loads it, and check that:
+
+        - reheader(read_csv(url), headers) is the frame of
+          pd.read_csv(url, names=headers), with one download,
+        - a second read_csv(url) within max_age sends no request
+          at all,
+        - asking again with max_age=0 gets '304 Not Modified'.
+"""
+
+
+AUTO_HEADERS = ['symboling', 'normalized-losses', 'make', 'fuel-type',
+                'aspiration', 'num-of-doors', 'body-style',
+                'drive-wheels', 'engine-location', 'wheel-base',
+                'length', 'width', 'height', 'curb-weight',
+                'engine-type', 'num-of-cylinders', 'engine-size',
+                'fuel-system', 'bore', 'stroke', 'compression-ratio',
+                'horsepower', 'peak-rpm', 'city-mpg', 'highway-mpg',
+                'price']
+
+AUTO_ROWS = [
+    '3,?,alfa-romero,gas,std,two,convertible,rwd,front,88.60,168.80,'
+    '64.10,48.80,2548,dohc,four,130,mpfi,3.47,2.68,9.00,111,5000,21,'
+    '27,13495',
+    '2,164,audi,gas,std,four,sedan,fwd,front,99.80,176.60,66.20,'
+    '54.30,2337,ohc,four,109,mpfi,3.19,3.40,10.00,102,5500,24,30,'
+    '13950',
+    '1,?,bmw,gas,std,two,sedan,rwd,front,101.20,176.80,64.80,54.30,'
+    '2710,ohc,six,164,mpfi,3.31,3.19,9.00,121,4250,21,28,?',
+    '0,?,volvo,diesel,turbo,four,wagon,rwd,front,104.30,188.80,67.20,'
+    '57.50,3157,ohc,four,130,mpfi,?,?,7.50,?,?,17,22,18420']
+
+
+def write_auto_csv(path, n_rows):
+    with open(path, 'w') as data_file:
+        for number in range(n_rows):
+            data_file.write(AUTO_ROWS[number % len(AUTO_ROWS)] + '\n')
+
+
+def benchmark_reheader_http(n_rows=205, latency=0.1):
+    with tempfile.TemporaryDirectory() as folder:
+        served = os.path.join(folder, 'served')
+        os.makedirs(served)
+        write_auto_csv(os.path.join(served, 'auto.csv'), n_rows)
+
+        requests = []
+        server = serve_folder(served, latency, requests)
+        url = ('http://127.0.0.1:' + str(server.server_port)
+               + '/auto.csv')
+        try:
+            expected = pd.read_csv(url, names=AUTO_HEADERS)
+            del requests[:]
+
+            start = time.perf_counter()
+            frame = reheader(read_csv(url, cache_dir=folder),
+                             AUTO_HEADERS)
+            print('     first read_csv(url) + reheader(): ',
+                  round(time.perf_counter() - start, 3), 's,',
+                  requests)
+            assert requests == [('GET', 200)], requests
+
+            start = time.perf_counter()
+            read_csv(url, cache_dir=folder)
+            print('     second read_csv(url):             ',
+                  round(time.perf_counter() - start, 3), 's,',
+                  requests[1:])
+            assert requests == [('GET', 200)], requests
+
+            HTTPCache(folder).fetch(url, max_age=0)
+            print('     fetch(url, max_age=0):            ',
+                  requests[1:])
+            assert requests == [('GET', 200), ('GET', 304)], requests
+        finally:
+            server.shutdown()
+
+        frame.attrs = {}
+        pd.testing.assert_frame_equal(frame, expected)
+
+
+# benchmark_reheader_http()
@@ -0,0 +1,499 @@
+"""
+Missing Values
+
+    Step 8 of 'Data Wrangling.py' counted the missing values with:
+
+        global check_missing
+        check_missing = dataframe.isnull()
+
+        for column in check_missing.columns.values.tolist():
+            print(column)
+            print(check_missing[column].value_counts())
+
+    dataframe.isnull() builds a whole new frame of booleans: one
+        BYTE for every cell of the data. It was kept in a global
+        variable, and then scanned once more per column.
+
+    analyze_missing() looks at ONE column at a time, packs its
+        missing values into a bitmap (one BIT per row), and keeps
+        only what we want to know:
+
+        - the number of missing values per column,
+        - the number of missing values per row,
+        - the co-missingness of every pair of columns (how many
+          rows miss both), counted from the bitmaps with popcount,
+        - the missingness patterns (which SET of columns is
+          missing together, and in how many rows).
+
+        Columns without any missing value are skipped at once
+        (arrow-backed columns know their null count for free).
+
+    It takes a DataFrame, or an iterable of DataFrame chunks (for
+        example pd.read_csv(path, chunksize=...)), so frames
+        larger than memory can be analyzed chunk by chunk.
+
+    The result is a MissingReport: print it to get the old output,
+        or use its attributes:
+
+        report.columns      nulls, non_null and percent per column
+        report.row_nulls    the number of missing values of every
+                            row (a Series, or None when streaming)
+        report.row_counts   how many rows miss 0, 1, 2 ... values
+        report.co_missing   column x column: rows missing both
+        report.patterns     the most frequent patterns
+
+    Section 4: MissingIndex, for trying many dropna() conditions
+        (thresh, subset) on the same frame without scanning it
+        again for each one.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_profile import chunks_of
+
+
+# the number of 1-bits of every byte
+POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)],
+                    dtype=np.uint8)
+
+
+"""
+1. Bitmaps
+"""
+
+
+def null_count(column):
+    """
+    The number of missing values of 'column', read from the
+    validity bitmap of arrow-backed columns, without building a
+    mask.
+    """
+    array = column.array
+    if hasattr(array, '_pa_array'):
+        return array._pa_array.null_count
+
+    return None
+
+
+def null_bitmap(column):
+    """
+    The missing values of 'column' as a bitmap: bit i (in
+    little-endian bit order) is set when row i is missing.
+    """
+    return np.packbits(column.isna().to_numpy(), bitorder='little')
+
+
+def popcount(bitmaps):
+    """
+    The number of 1-bits of every row of a 2-d array of bitmaps.
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bitmaps).sum(axis=-1, dtype=np.int64)
+
+    return POPCOUNT[bitmaps].sum(axis=-1, dtype=np.int64)
+
+
+"""
+2. Counting, chunk after chunk
+"""
+
+
+class MissingCounter:
+    def __init__(self, columns, keep_rows=True):
+        self.columns = list(columns)
+        self.nulls = np.zeros(len(self.columns), dtype=np.int64)
+        self.co_missing = np.zeros((len(self.columns),
+                                    len(self.columns)), dtype=np.int64)
+        self.patterns = {}
+        self.row_counts = {}
+        self.row_nulls = [] if keep_rows else None
+        self.n_rows = 0
+
+    def update(self, chunk):
+        if list(chunk.columns) != self.columns:
+            raise ValueError('every chunk must have the same columns')
+
+        n_rows = len(chunk)
+        missing = []
+        bitmaps = []
+        for position in range(len(self.columns)):
+            column = chunk.iloc[:, position]
+            if null_count(column) == 0:
+                continue
+
+            bitmap = null_bitmap(column)
+            count = int(popcount(bitmap))
+            if count:
+                missing.append(position)
+                bitmaps.append(bitmap)
+                self.nulls[position] += count
+
+        self.n_rows += n_rows
+        if not missing:
+            self.add_rows(np.zeros(n_rows, dtype=np.uint16), None,
+                          missing)
+            return self
+
+        bitmaps = np.stack(bitmaps)
+        for row, position in enumerate(missing):
+            self.co_missing[position, missing[row:]] += popcount(
+                bitmaps[row] & bitmaps[row:])
+
+        # the pattern of every row, as bits of 64-bit keys: bit b of
+        # the key is set when the b-th column with nulls is missing
+        keys = np.zeros((n_rows, -(-len(missing) // 64)),
+                        dtype=np.uint64)
+        row_nulls = np.zeros(n_rows, dtype=np.uint16)
+        for bit, bitmap in enumerate(bitmaps):
+            is_missing = np.unpackbits(bitmap, count=n_rows,
+                                       bitorder='little')
+            row_nulls += is_missing
+            keys[:, bit // 64] |= (is_missing.astype(np.uint64)
+                                   << np.uint64(bit % 64))
+
+        self.add_rows(row_nulls, keys, missing)
+        return self
+
+    def add_rows(self, row_nulls, keys, missing):
+        if self.row_nulls is not None:
+            self.row_nulls.append(row_nulls)
+
+        counts = np.bincount(row_nulls)
+        for nulls in np.flatnonzero(counts):
+            self.row_counts[int(nulls)] = (self.row_counts.get(
+                int(nulls), 0) + int(counts[nulls]))
+
+        if not missing:
+            self.patterns[()] = self.patterns.get((), 0) + len(row_nulls)
+            return
+
+        if keys.shape[1] == 1:
+            keys, counts = np.unique(keys[:, 0], return_counts=True)
+            keys = keys[:, None]
+        else:
+            keys, counts = np.unique(keys, axis=0, return_counts=True)
+
+        for key, count in zip(keys, counts):
+            positions = np.flatnonzero(np.unpackbits(
+                key.astype('<u8').view(np.uint8), count=len(missing),
+                bitorder='little'))
+            pattern = tuple(self.columns[missing[position]]
+                            for position in positions)
+            self.patterns[pattern] = self.patterns.get(pattern, 0) + int(
+                count)
+
+    def report(self, n_patterns=10):
+        nulls = pd.Series(self.nulls, index=self.columns)
+        columns = pd.DataFrame({
+            'nulls': nulls,
+            'non_null': self.n_rows - nulls,
+            'percent': 100 * nulls / max(self.n_rows, 1)})
+
+        co_missing = np.triu(self.co_missing)
+        co_missing = co_missing + np.triu(co_missing, 1).T
+        co_missing = pd.DataFrame(co_missing, index=self.columns,
+                                  columns=self.columns)
+
+        patterns = pd.DataFrame(
+            [{'missing': pattern, 'n_missing': len(pattern),
+              'rows': count}
+             for pattern, count in self.patterns.items()],
+            columns=['missing', 'n_missing', 'rows'])
+        patterns = patterns.sort_values('rows', ascending=False,
+                                        kind='stable')
+        patterns = patterns.head(n_patterns).reset_index(drop=True)
+
+        row_counts = pd.Series(self.row_counts, dtype=np.int64)
+        row_counts = row_counts.sort_index().rename_axis('nulls')
+
+        row_nulls = None
+        if self.row_nulls is not None:
+            row_nulls = pd.Series(
+                np.concatenate(self.row_nulls or
+                               [np.zeros(0, dtype=np.uint16)]),
+                name='nulls')
+
+        return MissingReport(columns, row_nulls, row_counts,
+                             co_missing, patterns, self.n_rows)
+
+
+class MissingReport:
+    def __init__(self, columns, row_nulls, row_counts, co_missing,
+                 patterns, n_rows):
+        self.columns = columns
+        self.row_nulls = row_nulls
+        self.row_counts = row_counts
+        self.co_missing = co_missing
+        self.patterns = patterns
+        self.n_rows = n_rows
+
+    def with_missing(self):
+        """
+        The names of the columns which miss at least one value.
+        """
+        return self.columns.index[self.columns['nulls'] > 0].tolist()
+
+    def __str__(self):
+        lines = []
+        for column, row in self.columns.iterrows():
+            lines += [str(column),
+                      'False    ' + str(int(row['non_null'])),
+                      'True     ' + str(int(row['nulls'])), '']
+
+        lines += ['     Rows by number of missing values: ', '',
+                  str(self.row_counts), '',
+                  '     Most frequent missing-value patterns: ', '',
+                  str(self.patterns), '']
+        return '\n'.join(lines)
+
+
+"""
+3. The whole frame (or file)
+"""
+
+
+def analyze_missing(data, chunk_rows=1_000_000, keep_rows=None,
+                    n_patterns=10):
+    """
+    Return a MissingReport of 'data' (a DataFrame, or an iterable of
+    DataFrame chunks).
+
+    'keep_rows': keep the number of missing values of every row
+        (2 bytes per row). By default, only for a DataFrame.
+    'n_patterns': the number of patterns in the report.
+    """
+    if keep_rows is None:
+        keep_rows = isinstance(data, pd.DataFrame)
+    if isinstance(data, pd.DataFrame):
+        index = data.index
+        data = chunks_of(data, chunk_rows)
+    else:
+        index = None
+
+    counter = None
+    for chunk in data:
+        if counter is None:
+            counter = MissingCounter(chunk.columns, keep_rows)
+        counter.update(chunk)
+
+    if counter is None:
+        counter = MissingCounter([], keep_rows)
+
+    report = counter.report(n_patterns)
+    if report.row_nulls is not None and index is not None:
+        report.row_nulls.index = index
+
+    return report
+
+
+"""
+4. Dropping rows, fast
+
+    Every df.dropna(thresh=...) call scans the whole frame again,
+        so trying thresh=1, 2, 3 ... to see how much data each one
+        would leave is one full scan per try.
+
+    MissingIndex scans the frame ONCE and keeps:
+
+        - the bitmap of every column which has missing values,
+        - the number of missing values of every row.
+
+    Then:
+
+        index.preview()             how many rows every possible
+                                    'thresh' keeps (no data is
+                                    touched or copied)
+        index.keep(thresh=2)        the rows dropna() would keep
+                                    (a boolean array)
+        index.dropna(df, thresh=2)  == df.dropna(thresh=2)
+
+    'subset' works as in dropna(): the counts of a subset of
+        columns are added up from their bitmaps once, then
+        remembered.
+
+    The index describes the frame AS IT WAS when the index was
+        built: build a new one after changing the frame.
+"""
+
+
+class MissingIndex:
+    def __init__(self, frame):
+        self.columns = pd.Index(frame.columns)
+        self.n_rows = len(frame)
+        self.bitmaps = {}           # column position -> bitmap
+        self.row_nulls = np.zeros(self.n_rows, dtype=np.uint16)
+
+        for position in range(len(self.columns)):
+            column = frame.iloc[:, position]
+            if null_count(column) == 0:
+                continue
+
+            bitmap = null_bitmap(column)
+            if popcount(bitmap):
+                self.bitmaps[position] = bitmap
+                self.row_nulls += self.unpack(bitmap)
+
+        self.subset_nulls = {}
+
+    def unpack(self, bitmap):
+        return np.unpackbits(bitmap, count=self.n_rows,
+                             bitorder='little')
+
+    def nulls(self, subset=None):
+        """
+        Return (missing values per row, number of columns), over
+        the columns of 'subset' (all the columns by default).
+        """
+        if subset is None:
+            return self.row_nulls, len(self.columns)
+
+        if isinstance(subset, (str, int)):
+            subset = [subset]
+        positions = self.columns.get_indexer_for(list(subset))
+        if (positions < 0).any():
+            raise KeyError(np.array(subset)[positions < 0].tolist())
+
+        key = tuple(sorted(set(positions.tolist())))
+        if key not in self.subset_nulls:
+            nulls = np.zeros(self.n_rows, dtype=np.uint16)
+            for position in key:
+                if position in self.bitmaps:
+                    nulls += self.unpack(self.bitmaps[position])
+            self.subset_nulls[key] = nulls
+
+        return self.subset_nulls[key], len(key)
+
+    def keep(self, how='any', thresh=None, subset=None):
+        """
+        The rows which df.dropna(how=how, thresh=thresh,
+        subset=subset) keeps, as a boolean array.
+        """
+        nulls, width = self.nulls(subset)
+        if thresh is not None:
+            return width - nulls.astype(np.int64) >= thresh
+        if how == 'any':
+            return nulls == 0
+        if how == 'all':
+            return nulls < width
+
+        raise ValueError('invalid how option: ' + repr(how))
+
+    def dropna(self, frame, how='any', thresh=None, subset=None):
+        if len(frame) != self.n_rows:
+            raise ValueError('the frame has changed since the index '
+                             'was built')
+
+        return frame[self.keep(how, thresh, subset)]
+
+    def preview(self, thresholds=None, subset=None):
+        """
+        A DataFrame with one row per 'thresh' (every possible value
+        by default): the number of rows that dropna(thresh=thresh,
+        subset=subset) would keep and drop.
+        """
+        nulls, width = self.nulls(subset)
+        rows = np.bincount(width - nulls.astype(np.int64),
+                           minlength=width + 1)
+        # kept[t]: the rows with at least t values
+        kept = np.append(np.cumsum(rows[::-1])[::-1], 0)
+
+        if thresholds is None:
+            thresholds = range(width + 1)
+        thresholds = np.asarray(list(thresholds), dtype=np.int64)
+        rows_kept = kept[thresholds.clip(0, width + 1)]
+
+        return pd.DataFrame({
+            'thresh': thresholds,
+            'rows_kept': rows_kept,
+            'rows_dropped': self.n_rows - rows_kept,
+            'percent_kept': 100 * rows_kept / max(self.n_rows, 1)})
+
+
+"""
+5. Benchmarks
+
+    5.1 Time the old check_missing_values() (without its prints)
+        against analyze_missing() on a frame with 'n_rows' rows
+        and 'n_columns' columns, a few percent of them missing,
+        and check the per-column counts.
+"""
+
+
+def make_missing_frame(n_rows, n_columns, random_state=0):
+    rng = np.random.default_rng(random_state)
+    frame = {}
+    for number in range(n_columns):
+        values = rng.random(n_rows)
+        values[rng.random(n_rows) < 0.01 * (number % 5)] = np.nan
+        frame['column_' + str(number)] = values
+
+    return pd.DataFrame(frame)
+
+
+def benchmark_analyze_missing(n_rows=2_000_000, n_columns=30):
+    frame = make_missing_frame(n_rows, n_columns)
+    print('     Rows: ', n_rows, ' Columns: ', n_columns)
+
+    start = time.perf_counter()
+    check_missing = frame.isnull()
+    expected = {column: check_missing[column].value_counts()
+                for column in check_missing.columns.values.tolist()}
+    old_time = time.perf_counter() - start
+    print('     isnull() + value_counts(): ', round(old_time, 3), 's,',
+          round(check_missing.memory_usage().sum() / 1024 ** 2),
+          'MB of booleans')
+    del check_missing
+
+    start = time.perf_counter()
+    report = analyze_missing(frame)
+    new_time = time.perf_counter() - start
+    print('     analyze_missing():         ', round(new_time, 3),
+          's  (with row counts, co-missingness and patterns)')
+
+    for column, counts in expected.items():
+        assert counts.get(True, 0) == report.columns.loc[column,
+                                                         'nulls']
+
+
+# benchmark_analyze_missing()
+
+
+"""
+    5.2 Time trying every 'thresh' with dropna() against a
+        MissingIndex (built once, then preview() and one
+        dropna() per 'thresh'), and check the rows kept.
+"""
+
+
+def benchmark_missing_index(n_rows=2_000_000, n_columns=30):
+    frame = make_missing_frame(n_rows, n_columns)
+    thresholds = range(n_columns - 5, n_columns + 1)
+    print('     Rows: ', n_rows, ' Columns: ', n_columns,
+          ' thresh: ', list(thresholds))
+
+    start = time.perf_counter()
+    expected = [len(frame.dropna(thresh=thresh))
+                for thresh in thresholds]
+    old_time = time.perf_counter() - start
+    print('     dropna() per thresh:       ', round(old_time, 3), 's')
+
+    start = time.perf_counter()
+    index = MissingIndex(frame)
+    build_time = time.perf_counter() - start
+    preview = index.preview(thresholds)
+    preview_time = time.perf_counter() - start - build_time
+    print('     MissingIndex():            ', round(build_time, 3),
+          's, then preview(): ', round(preview_time, 4), 's')
+
+    assert preview['rows_kept'].tolist() == expected
+
+    start = time.perf_counter()
+    for thresh in thresholds:
+        index.dropna(frame, thresh=thresh)
+    print('     index.dropna() per thresh: ',
+          round(time.perf_counter() - start, 3), 's')
+
+
+# benchmark_missing_index()
@@ -0,0 +1,277 @@
+"""
+Sketches
+
+    A sketch is a SMALL summary of a column, from which we can
+        answer a question about the WHOLE column approximately,
+        with a known error:
+
+        - KLLSketch:          quantiles (25%, 50%, 75%, ...)
+        - HyperLogLog:        number of distinct values
+        - MisraGries:         the most frequent values, and how
+                              often they appear
+
+    Three things make them useful for big data:
+
+        1. Their size does not grow (or grows very slowly) with
+           the number of rows.
+        2. They can be built chunk by chunk: sketch.update(chunk)
+           for every chunk of a file read with 'chunksize='.
+        3. They are MERGEABLE: two workers can each sketch half
+           of the data, and a.merge(b) gives the sketch of all of
+           it. They are plain Python objects holding numpy
+           arrays, so they can be sent between processes.
+
+    Exact quantiles need all the values sorted (or at least
+        partitioned) in memory; exact distinct counts need a hash
+        table of every distinct value. Sketches need neither.
+"""
+import numpy as np
+import pandas as pd
+
+
+"""
+1. KLL quantile sketch
+
+    Values are kept in 'levels'. An item at level h stands for
+        2**h of the original values.
+
+    When a level gets too full, it is sorted and every other item
+        (starting at a random first or second item) is promoted to
+        the level above, with twice the weight. The capacity of the
+        levels shrinks by 2/3 going down from the top, so most of
+        the memory goes to the top levels, which matter most.
+
+    Karnin, Lang & Liberty (2016), "Optimal Quantile Approximation
+        in Streams".
+"""
+
+
+class KLLSketch:
+    def __init__(self, k=200, random_state=None):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.rng = np.random.default_rng(random_state)
+
+    def capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 8)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.compress()
+        return self
+
+    def merge(self, other):
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level],
+                                                 items])
+
+        self.count += other.count
+        self.compress()
+        return self
+
+    def compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) <= self.capacity(level):
+                level += 1
+                continue
+
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+
+            items = np.sort(items)
+            kept = items[len(items) - len(items) % 2:]
+            items = items[:len(items) - len(items) % 2]
+
+            promoted = items[self.rng.integers(2)::2]
+            self.levels[level] = kept
+            self.levels[level + 1] = np.concatenate(
+                [self.levels[level + 1], promoted])
+
+            # capacities depend on the number of levels: start over
+            level = 0
+
+    def sorted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(values), 2 ** level)
+                                  for level, values
+                                  in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, quantiles):
+        if self.count == 0:
+            return [np.nan for _ in quantiles]
+
+        items, ranks = self.sorted_items()
+        positions = np.searchsorted(
+            ranks, [q * ranks[-1] for q in quantiles], side='left')
+        positions = positions.clip(max=len(items) - 1)
+        return list(items[positions])
+
+    def rank_error(self):
+        """
+        The (normalized) rank error, holding with about 99%
+        confidence: the value returned for quantile q has a true
+        quantile between q - rank_error() and q + rank_error().
+        Empirical constants from the Apache DataSketches KLL
+        implementation.
+        """
+        return 2.296 / self.k ** 0.9723
+
+    def nbytes(self):
+        return sum(values.nbytes for values in self.levels)
+
+
+"""
+2. HyperLogLog distinct count sketch
+
+    Every value is hashed to 64 bits. The first 'precision' bits
+        choose one of 2**precision registers; each register
+        remembers the longest run of leading zeros seen in the
+        rest of the bits. Many distinct values make long runs
+        likely, so the registers together estimate the number of
+        distinct values.
+
+    Flajolet, Fusy, Gandouet & Meunier (2007), "HyperLogLog".
+
+    Values are hashed with pd.util.hash_pandas_object, so the
+        same value gives the same hash in every chunk and every
+        process, as long as its dtype is the same.
+"""
+
+
+class HyperLogLog:
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        values = pd.Series(values)
+        values = values[values.notna()]
+        if values.empty:
+            return self
+
+        hashes = pd.util.hash_pandas_object(values,
+                                            index=False).to_numpy()
+        self.update_hashes(hashes)
+        return self
+
+    def update_hashes(self, hashes):
+        bits = 64 - self.precision
+        register = (hashes >> np.uint64(bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << bits) - 1)
+
+        # position of the first 1-bit in the remaining 'bits' bits
+        # (rest < 2**50 converts to float exactly)
+        bit_length = np.frexp(rest.astype(float))[1]
+        rank = (bits - bit_length + 1).astype(np.uint8)
+
+        np.maximum.at(self.registers, register, rank)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('cannot merge HyperLogLog sketches of '
+                             'different precision')
+
+        np.maximum(self.registers, other.registers,
+                   out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(
+            np.ldexp(1.0, -self.registers.astype(int)))
+
+        empty = np.count_nonzero(self.registers == 0)
+        if raw <= 2.5 * m and empty:
+            # small range correction: linear counting
+            return float(m * np.log(m / empty))
+
+        return float(raw)
+
+    def relative_error(self):
+        """
+        The standard error of estimate(), relative to the true
+        count. About 95% of estimates are within 2 standard errors.
+        """
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def nbytes(self):
+        return self.registers.nbytes
+
+
+"""
+3. Misra-Gries heavy hitters
+
+    Keeps at most 'k' counters. When there are more, the (k+1)-th
+        largest count is subtracted from every counter, and the
+        counters which drop to zero or below are removed.
+
+    Every count it gives is an UNDERESTIMATE of the true count, by
+        at most error_bound() (the sum of everything subtracted,
+        which is never more than n / (k + 1) for n values). So
+        every value which appears more than error_bound() times
+        is still there.
+
+    Chunks are counted exactly first (value_counts()), then added,
+        and two sketches merge the same way (Agarwal et al.
+        (2012), "Mergeable Summaries").
+
+    Misra & Gries (1982), "Finding Repeated Elements".
+"""
+
+
+class MisraGries:
+    def __init__(self, k=1000):
+        self.k = k
+        self.counts = pd.Series(dtype=np.int64)
+        self.count = 0
+        self.error = 0
+
+    def update(self, values):
+        return self.update_counts(pd.Series(values).value_counts())
+
+    def update_counts(self, counts):
+        """
+        Add the exact counts of a chunk: a Series of counts indexed
+        by value.
+        """
+        self.count += int(counts.sum())
+        self.reduce(self.counts.add(counts, fill_value=0))
+        return self
+
+    def merge(self, other):
+        self.count += other.count
+        self.error += other.error
+        self.reduce(self.counts.add(other.counts, fill_value=0))
+        return self
+
+    def reduce(self, counts):
+        counts = counts.astype(np.int64)
+        if len(counts) > self.k:
+            cut = int(counts.nlargest(self.k + 1).iloc[-1])
+            counts = counts[counts > cut] - cut
+            self.error += cut
+
+        self.counts = counts
+
+    def top(self, n=None):
+        counts = self.counts.sort_values(ascending=False, kind='stable')
+        return counts if n is None else counts.head(n)
+
+    def error_bound(self):
+        return self.error
+
+    def nbytes(self):
+        return int(self.counts.memory_usage(deep=True))
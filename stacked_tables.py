@@ -0,0 +1,620 @@
+"""
+Stacked Tables
+
+    Helpers for datasets like the one in the Data Cleaning
+        Challenge: a .csv file containing so many tables
+        within, ALL pasted vertically, each table starting
+        with its own 'first name' row and its own repeat of
+        the column names.
+
+    The tutorial script solves the challenge step by step.
+        The functions below do the same steps, but they are
+        written so that they still run fast when the stacked
+        file has tens of millions of rows.
+"""
+import functools
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+"""
+1. Boundary predicates
+
+    A boundary predicate is a function which takes a column
+        (a pandas Series) and returns a True/False mask.
+
+        'True' means the row STARTS a new table.
+
+    The challenge dataset uses the 'first name' row as the
+        start of every table, but other stacked exports may
+        use the repeated header row, a blank row, etc.
+        So we can build our own predicates with the two
+        helpers below.
+
+    The helpers return functools.partial objects (not nested
+        functions), so the predicates can be sent to worker
+        processes (see section 4).
+"""
+
+
+def column_contains(column, marker):
+    return column.str.contains(marker, regex=False, na=False)
+
+
+def column_equals(column, marker):
+    return column == marker
+
+
+def contains_marker(marker):
+    return functools.partial(column_contains, marker=marker)
+
+
+def equals_marker(marker):
+    return functools.partial(column_equals, marker=marker)
+
+
+first_name_boundary = contains_marker('first name')
+
+
+"""
+2. Segment ids
+
+    In the tutorial script, the 'Iterations' column is built
+        with a 'for' loop: every time we meet 'first name', we
+        add 1 to a counter, then append the counter for every
+        row.
+
+    That is exactly a CUMULATIVE SUM over the boundary mask:
+
+        mask:        T  F  F  F  T  F  F
+        cumsum:      1  1  1  1  2  2  2
+
+    numpy does the cumulative sum in C, so there is no
+        Python-level work per row.
+"""
+
+
+def segment_ids(column, is_boundary=first_name_boundary):
+    """
+    Return an integer array holding the table number of every
+    row in 'column'.
+
+    Rows before the first boundary get the number 0, exactly
+    like the counter in the tutorial loop.
+    """
+    mask = np.asarray(is_boundary(column), dtype=bool)
+    return np.cumsum(mask, dtype=np.int64)
+
+
+def loop_segment_ids(column, marker='first name'):
+    """
+    The original 'for' loop from the Data Cleaning Challenge,
+    kept here so that we can compare it with segment_ids().
+    """
+    column_values = []
+    counter = 0
+
+    for i in column:
+        if marker in i:
+            counter += 1
+
+        column_values.append(counter)
+
+    return column_values
+
+
+"""
+3. Streaming the stacked file
+
+    The tutorial script loads the WHOLE file, then filters it
+        again and again (drop the NaNs, drop the repeated
+        column names, keep the 'first name' rows, drop the
+        'first name' rows ...). Each filter is a full pass over
+        the data, and each one is stored in memory.
+
+    iter_stacked_chunks() reads the file a chunk at a time and
+        does all of these steps on each chunk, so memory stays
+        the size of ONE chunk, however big the file is.
+
+    The table number is carried from one chunk to the next, so
+        a table which starts at the end of a chunk and continues
+        in the next chunk keeps the same number.
+
+    Note:
+        Every column is read as text (dtype=str) unless you
+        pass your own 'dtype'. The repeated column names make
+        every column text anyway, and this way all chunks get
+        the SAME dtypes, whatever rows they happen to hold.
+"""
+
+
+def split_stacked_rows(frame, first_table=0,
+                       marker_column='Row Type',
+                       is_boundary=first_name_boundary,
+                       table_column='Iterations'):
+    """
+    Do steps 4, 5, 6 and 10 of the tutorial script on 'frame' in
+    one go: drop the rows with no 'marker_column' value, number
+    the tables (counting on from 'first_table'), drop the repeated
+    column names, then split the 'first name' rows from the data
+    rows.
+
+    Return (name_rows, data_rows, last_table).
+    """
+    frame = frame[frame[marker_column].notna()]
+    if frame.empty:
+        return frame, frame, first_table
+
+    is_name = np.asarray(is_boundary(frame[marker_column]),
+                         dtype=bool)
+    tables = np.cumsum(is_name, dtype=np.int64) + first_table
+
+    frame = frame.assign(**{table_column: tables})
+    keep = (frame[marker_column] != marker_column).to_numpy()
+
+    return (frame[keep & is_name], frame[keep & ~is_name],
+            int(tables[-1]))
+
+
+def iter_stacked_chunks(path, chunksize=100_000,
+                        marker_column='Row Type',
+                        is_boundary=first_name_boundary,
+                        table_column='Iterations',
+                        **read_csv_options):
+    """
+    Yield (name_rows, data_rows) pairs, one pair per chunk of the
+    stacked .csv file at 'path'.
+
+    Both DataFrames get a 'table_column' holding the table
+    number of every row, exactly like the 'Iterations' column
+    of the tutorial script. Repeated column-name rows and rows
+    with no 'marker_column' value are dropped.
+    """
+    read_csv_options.setdefault('dtype', str)
+    last_table = 0
+
+    for chunk in pd.read_csv(path, chunksize=chunksize,
+                             **read_csv_options):
+        name_rows, data_rows, last_table = split_stacked_rows(
+            chunk, last_table, marker_column, is_boundary,
+            table_column)
+
+        if len(name_rows) or len(data_rows):
+            yield name_rows, data_rows
+
+
+"""
+4. Many files, one per team
+
+    The challenge dataset exists because someone pasted every
+        team's table into ONE file. If we still have the team
+        files, we do not need to paste them at all:
+
+        ingest_team_files() reads every .csv/.xlsx file in a
+        folder in a pool of processes (one file per task),
+        cleans each file with split_stacked_rows(), then
+        concatenates everything ONCE at the end.
+
+    Each team gets its own table numbers, in the (sorted) order
+        of the file names.
+
+    A file which cannot be read or does not have the
+        'marker_column' is NOT allowed to stop the whole job.
+        It is skipped, and its error is written in the report.
+
+    The report is a DataFrame with one row per file:
+        file, tables, rows, seconds, error
+"""
+TEAM_FILE_SUFFIXES = ('.csv', '.xlsx', '.xls')
+
+
+def read_team_file(path, **read_options):
+    if path.lower().endswith('.csv'):
+        return pd.read_csv(path, **read_options)
+
+    return pd.read_excel(path, **read_options)
+
+
+def ingest_team_file(path, marker_column='Row Type',
+                     is_boundary=first_name_boundary,
+                     table_column='Iterations', **read_options):
+    """
+    Read and clean ONE team file.
+
+    Return (name_rows, data_rows, report_row). The table numbers
+    in the two DataFrames start from 1 for every file; they are
+    shifted by ingest_team_files().
+    """
+    read_options.setdefault('dtype', str)
+    start = time.perf_counter()
+    report_row = {'file': os.path.basename(path), 'tables': 0,
+                  'rows': 0, 'seconds': 0.0, 'error': None}
+
+    try:
+        frame = read_team_file(path, **read_options)
+        if marker_column not in frame.columns:
+            raise KeyError('missing column ' + repr(marker_column))
+
+        name_rows, data_rows, n_tables = split_stacked_rows(
+            frame, 0, marker_column, is_boundary, table_column)
+    except Exception as error:
+        name_rows = data_rows = None
+        report_row['error'] = type(error).__name__ + ': ' + str(error)
+    else:
+        report_row['tables'] = n_tables
+        report_row['rows'] = len(data_rows)
+
+    report_row['seconds'] = time.perf_counter() - start
+    return name_rows, data_rows, report_row
+
+
+def ingest_team_files(folder, processes=None,
+                      marker_column='Row Type',
+                      is_boundary=first_name_boundary,
+                      table_column='Iterations', **read_options):
+    """
+    Read, check and clean every team file in 'folder' in parallel.
+
+    Return (name_rows, data_rows, report). 'processes' defaults to
+    the number of CPU cores; processes=1 reads the files one by
+    one in this process.
+
+    Note: 'is_boundary' is sent to the worker processes, so it
+    must be picklable: use contains_marker(), equals_marker() or
+    a function defined at the top level of a module.
+    """
+    paths = sorted(os.path.join(folder, name)
+                   for name in os.listdir(folder)
+                   if name.lower().endswith(TEAM_FILE_SUFFIXES))
+
+    ingest = functools.partial(ingest_team_file,
+                               marker_column=marker_column,
+                               is_boundary=is_boundary,
+                               table_column=table_column,
+                               **read_options)
+
+    if processes == 1:
+        results = [ingest(path) for path in paths]
+    else:
+        workers = processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(paths) // (workers * 4))
+            results = list(pool.map(ingest, paths,
+                                    chunksize=chunksize))
+
+    name_parts, data_parts, report_rows = [], [], []
+    last_table = 0
+
+    for name_rows, data_rows, report_row in results:
+        report_rows.append(report_row)
+        if report_row['error'] is not None:
+            continue
+
+        # shift this file's table numbers after the previous files
+        name_rows = name_rows.assign(
+            **{table_column: name_rows[table_column] + last_table})
+        data_rows = data_rows.assign(
+            **{table_column: data_rows[table_column] + last_table})
+        last_table += report_row['tables']
+
+        name_parts.append(name_rows)
+        data_parts.append(data_rows)
+
+    report = pd.DataFrame(report_rows,
+                          columns=['file', 'tables', 'rows',
+                                   'seconds', 'error'])
+
+    if not name_parts:
+        empty = pd.DataFrame()
+        return empty, empty, report
+
+    return (pd.concat(name_parts, ignore_index=True),
+            pd.concat(data_parts, ignore_index=True),
+            report)
+
+
+"""
+5. Attaching the names to the data
+
+    Step 11 of the tutorial script joins the 'first name' rows
+        to the data rows with pd.merge(..., on='Iterations').
+        pd.merge builds a hash table of the keys, because it
+        cannot assume anything about their order.
+
+    But we KNOW the order: both DataFrames come out of the file
+        sorted by table number, and there is exactly ONE name
+        row per table. So the data rows of a table are one
+        unbroken run, and all we have to do is repeat each
+        table's name row once per row of its run:
+
+        runs of data rows:     1 1 1 | 2 2 | 3 3 3 3
+        name row positions:    0 0 0 | 1 1 | 2 2 2 2
+
+    attach_headers() does this with numpy (np.repeat over the
+        run lengths), then takes the name rows at those
+        positions. No hashing at all.
+
+    The result is the SAME as the inner pd.merge: the same
+        rows, the same column order and the same '_x'/'_y'
+        suffixes for columns found on both sides.
+        check_attach_headers() compares the two.
+"""
+
+
+def attach_headers(name_rows, data_rows, table_column='Iterations'):
+    """
+    Inner-join 'name_rows' onto 'data_rows' by 'table_column',
+    using the fact that both are sorted by table number.
+
+    Raise ValueError if 'name_rows' is not strictly increasing in
+    'table_column' or 'data_rows' is not sorted by it. Use pd.merge
+    for such data.
+    """
+    name_tables = name_rows[table_column].to_numpy()
+    data_tables = data_rows[table_column].to_numpy()
+
+    if (np.diff(name_tables) <= 0).any():
+        raise ValueError('name_rows must have exactly one row per '
+                         'table, sorted by ' + repr(table_column))
+    if (np.diff(data_tables) < 0).any():
+        raise ValueError('data_rows must be sorted by '
+                         + repr(table_column))
+
+    # one run per table in the data rows
+    changes = np.ones(len(data_tables), dtype=bool)
+    changes[1:] = data_tables[1:] != data_tables[:-1]
+    run_starts = np.flatnonzero(changes)
+    run_tables = data_tables[run_starts]
+    run_lengths = np.diff(np.append(run_starts, len(data_tables)))
+
+    # where is the name row of each run?
+    name_positions = np.zeros(len(run_tables), dtype=np.intp)
+    has_name = np.zeros(len(run_tables), dtype=bool)
+    if len(name_tables):
+        name_positions = np.searchsorted(name_tables, run_tables)
+        name_positions = name_positions.clip(max=len(name_tables) - 1)
+        has_name = name_tables[name_positions] == run_tables
+
+    left_positions = np.repeat(name_positions[has_name],
+                               run_lengths[has_name])
+
+    right = data_rows
+    if not has_name.all():
+        right = data_rows[np.repeat(has_name, run_lengths)]
+
+    overlap = ((set(name_rows.columns) & set(data_rows.columns))
+               - {table_column})
+    left = name_rows.take(left_positions).reset_index(drop=True)
+    left.columns = [column + '_x' if column in overlap else column
+                    for column in name_rows.columns]
+
+    right = right.drop(columns=table_column).reset_index(drop=True)
+    right.columns = [column + '_y' if column in overlap else column
+                     for column in right.columns]
+
+    return pd.concat([left, right], axis=1)
+
+
+def check_attach_headers(name_rows, data_rows,
+                         table_column='Iterations'):
+    expected = pd.merge(left=name_rows, right=data_rows,
+                        how='inner', on=table_column)
+    result = attach_headers(name_rows, data_rows, table_column)
+
+    pd.testing.assert_frame_equal(result, expected)
+    return result
+
+
+"""
+6. 'label: value' cells
+
+    The 'first name' rows hold cells like:
+
+        'first name: John'    'last name:Doe'    'date: 1/1/21'
+
+    Step 9 of the tutorial script removes the labels with
+        .str[12:], .str[11:] and .str[6:], i.e. by COUNTING the
+        characters of each label by hand. One extra space after
+        a colon and the first letter of every value is lost.
+
+    parse_labelled_column() instead:
+        - reads the label ONCE, from the first value of the column
+          (everything before the first ':'),
+        - removes '<label>:' and ANY spaces after it with one
+          vectorized regex replace. With pyarrow installed, the
+          column is turned into an Arrow string column first, so
+          the replace runs in Arrow's C++ string kernels instead
+          of on Python string objects,
+        - turns 'date' columns into real datetime64 columns.
+
+    Cells which do not start with the label are left as they are.
+"""
+try:
+    import pyarrow  # noqa: F401
+    TEXT_DTYPE = 'string[pyarrow]'
+except ImportError:
+    TEXT_DTYPE = 'string'
+
+
+def column_label(column):
+    values = column.dropna()
+    if values.empty:
+        return None
+
+    label, colon, value = str(values.iloc[0]).partition(':')
+    return label.strip() if colon else None
+
+
+def parse_labelled_column(column, label=None, date_labels=('date',),
+                          date_format=None):
+    """
+    Remove the 'label:' prefix from every cell of 'column'.
+
+    'label' is found from the first value of the column when it is
+    not given. If the label is one of 'date_labels', the values are
+    parsed to datetime64 (with 'date_format' if given); values which
+    are not dates become NaT.
+    """
+    if label is None:
+        label = column_label(column)
+
+    values = column.astype(TEXT_DTYPE)
+    if label is None:
+        return values
+
+    values = values.str.replace('^' + re.escape(label) + r':\s*',
+                                '', regex=True)
+
+    if label.lower() in date_labels:
+        return pd.to_datetime(values, format=date_format,
+                              errors='coerce')
+
+    return values
+
+
+def parse_labelled_columns(frame, columns=None, **options):
+    """
+    Run parse_labelled_column() on every column in 'columns' (all
+    the columns by default), and return a new DataFrame.
+    """
+    if columns is None:
+        columns = frame.columns
+
+    return frame.assign(**{
+        column: parse_labelled_column(frame[column], **options)
+        for column in columns})
+
+
+"""
+7. Benchmarks
+
+    7.1 Build a fake stacked 'Row Type' column, then time the
+        original loop against segment_ids().
+"""
+
+
+def make_stacked_row_type(n_tables, rows_per_table=10):
+    one_table = (['first name: x', 'Row Type']
+                 + ['data'] * rows_per_table)
+    return pd.Series(one_table * n_tables)
+
+
+def benchmark_segment_ids(n_tables=200_000, rows_per_table=10):
+    row_type = make_stacked_row_type(n_tables, rows_per_table)
+    print('     Rows: ', len(row_type))
+
+    start = time.perf_counter()
+    expected = loop_segment_ids(row_type)
+    loop_time = time.perf_counter() - start
+    print('     Python loop:   ', round(loop_time, 3), 's')
+
+    start = time.perf_counter()
+    result = segment_ids(row_type)
+    vectorized_time = time.perf_counter() - start
+    print('     segment_ids(): ', round(vectorized_time, 3), 's')
+
+    assert (result == np.asarray(expected)).all()
+    print('     Speed up:      ',
+          round(loop_time / vectorized_time, 1), 'x')
+
+
+# benchmark_segment_ids()
+
+
+"""
+    7.2 Write 'n_files' fake team files into a temporary folder,
+        then time ingest_team_files() with 1 process and with
+        all the CPU cores.
+"""
+
+
+def write_team_files(folder, n_files, rows_per_table=50):
+    header = 'Row Type,Iter Number,Power1,Speed1\n'
+
+    for team in range(n_files):
+        lines = [header,
+                 'first name: team,last name: %d,date: 1/1/2021,\n'
+                 % team]
+        lines += ['Iteration,%d,%d.5,%d\n' % (row, row, row * 2)
+                  for row in range(rows_per_table)]
+
+        with open(os.path.join(folder, 'team_%04d.csv' % team),
+                  'w') as team_file:
+            team_file.writelines(lines)
+
+
+def benchmark_ingest_team_files(n_files=1000, rows_per_table=50):
+    with tempfile.TemporaryDirectory() as folder:
+        write_team_files(folder, n_files, rows_per_table)
+        print('     Files: ', n_files)
+
+        for processes in (1, os.cpu_count() or 1):
+            start = time.perf_counter()
+            name_rows, data_rows, report = ingest_team_files(
+                folder, processes=processes)
+            total = time.perf_counter() - start
+
+            print('     Processes:', processes,
+                  ' Wall time:', round(total, 3), 's',
+                  ' Sum of per-file times:',
+                  round(report['seconds'].sum(), 3), 's')
+
+        assert report['error'].isna().all()
+        assert len(name_rows) == n_files
+        assert len(data_rows) == n_files * rows_per_table
+
+
+# benchmark_ingest_team_files()
+
+
+"""
+    7.3 Build fake name rows and data rows, check attach_headers()
+        against pd.merge, then time both.
+"""
+
+
+def make_name_and_data_rows(n_tables, rows_per_table=10):
+    tables = np.arange(1, n_tables + 1)
+    name_rows = pd.DataFrame({
+        'First Name': 'team',
+        'Last Name': tables.astype(str),
+        'Date': '1/1/2021',
+        'Iterations': tables})
+
+    data_tables = np.repeat(tables, rows_per_table)
+    data_rows = pd.DataFrame({
+        'Row Type': 'Iteration',
+        'Iter Number': np.tile(np.arange(rows_per_table), n_tables),
+        'Power1': np.random.rand(len(data_tables)),
+        'Iterations': data_tables})
+
+    return name_rows, data_rows
+
+
+def benchmark_attach_headers(n_tables=500_000, rows_per_table=10):
+    name_rows, data_rows = make_name_and_data_rows(n_tables,
+                                                   rows_per_table)
+    print('     Data rows: ', len(data_rows))
+    check_attach_headers(name_rows, data_rows)
+
+    start = time.perf_counter()
+    pd.merge(left=name_rows, right=data_rows, how='inner',
+             on='Iterations')
+    merge_time = time.perf_counter() - start
+    print('     pd.merge():       ', round(merge_time, 3), 's')
+
+    start = time.perf_counter()
+    attach_headers(name_rows, data_rows)
+    attach_time = time.perf_counter() - start
+    print('     attach_headers(): ', round(attach_time, 3), 's')
+    print('     Rows per second:  ',
+          int(len(data_rows) / attach_time))
+
+
+# benchmark_attach_headers()
@@ -0,0 +1,1003 @@
+"""
+Time Series
+
+    Helpers for WIDE time series files like the COVID-19 ones of
+        'Data Prep Tutorial for COVID-19.py': one row per
+        location, a few id columns (Province/State,
+        Country/Region, Lat, Long), then ONE COLUMN PER DAY.
+
+    get_and_melt_data() downloads the whole file and melts the
+        whole history again, every day, although the file only
+        grew by one column (and maybe a few corrected cells).
+
+    1. Incremental updates
+
+        SeriesStore keeps the melted (long) table in a folder, as
+            Feather files, and only melts what is new:
+
+            store = SeriesStore('autodata/confirmed', 'Confirmed')
+            print(store.update(read_csv(confirmed_cases_url)))
+            confirmed_df = store.load()
+
+        - the dates which are not in the store yet are melted and
+          appended, as one new part,
+        - locations which are new get all their dates,
+        - cells of known dates whose value was corrected in the
+          new file are found by comparing the new file with the
+          last one (its values are kept as a 'snapshot' array: one
+          array comparison),
+          and stored as 'revisions', applied by load(),
+        - compact() rewrites all the parts as one.
+
+        So melting and writing cost as much as the NEW data, not
+            the whole history. (Parsing the new wide file still
+            reads all of it: the server only has the whole file.)
+
+    2. Combining the series
+
+        Section 7 of the script combines the three series with
+
+            confirmed_df.join(death_df['Death']).join(
+                recovered_df['Recovered'])
+
+            which puts rows side by side by their POSITION. The
+            recovered file has fewer locations, so its rows land
+            next to the wrong locations, silently.
+
+        combine_series() matches the rows on their KEY
+            (Province/State, Country/Region, Date) instead:
+
+            final_df, unmatched = combine_series(
+                [confirmed_df, death_df, recovered_df])
+
+        - every key becomes ONE int64 number, and the numbers
+          follow the order of the melted rows (day after day,
+          location after location), so melted frames are already
+          sorted and need no sorting at all,
+        - the rows are then matched by a merge of sorted numbers
+          (np.searchsorted), not by a hash join,
+        - the columns of the first frame are used as they are (no
+          copy) when how='left',
+        - 'unmatched' lists the keys found in one frame and not in
+          the other, so nothing is lost silently.
+
+    3. A lighter melt
+
+        pd.melt() repeats the id columns once per melted column:
+            melting 1000 days repeats every Province/State,
+            Country/Region, Lat and Long string or number 1000
+            times. The 'variable' column repeats every column name
+            the same way, as text.
+
+        light_melt() takes the same arguments, but:
+
+        - the id columns come out as categoricals: the values are
+          kept ONCE, each row only holds a small integer code (1
+          or 2 bytes, instead of a pointer to a string, or 8
+          bytes),
+        - the 'variable' column is a categorical too, and it can be
+          typed while melting: var_type='datetime' parses the
+          column names ONCE (COVID dates), var_type='int' keeps
+          their number (billboard weeks 'wk1', 'wk2' ...; weather
+          days 'd1', 'd2' ...),
+        - the values are copied once, column after column.
+
+            confirmed_df = light_melt(df_confirmed, ID_COLUMNS,
+                                      var_name='Date',
+                                      value_name='Confirmed',
+                                      var_type='datetime',
+                                      date_format='%m/%d/%y')
+
+    4. Streaming melt
+
+        For wide files too big to load, stream_melt() reads the
+            file 'chunk_rows' rows at a time, melts each chunk
+            (light_melt()) and appends it to a .csv or .parquet
+            file straight away. Neither the wide nor the long table
+            is ever held whole in memory:
+
+            stream_melt(confirmed_cases_url, 'confirmed_long.parquet',
+                        ID_COLUMNS, var_name='Date',
+                        value_name='Confirmed')
+
+        The rows come out chunk after chunk: within a chunk, in
+            the order of pd.melt() (day after day).
+
+    5. Parsing dates once
+
+        After a melt, the 'Date' column holds '1/22/20' once per
+            location: 289 times the same string, for each of 1000+
+            days. pd.to_datetime() cannot guess the format of
+            '1/22/20' (month or day first?), so it falls back to
+            parsing the strings one by one.
+
+        parse_dates() parses every DISTINCT string once, with a
+            format found from those strings (DATE_FORMATS), and
+            maps the rows back to them with integer codes. For a
+            categorical column (light_melt()) the codes are already
+            there, so the cost is that of the distinct dates only.
+
+            confirmed_df['Date'] = parse_dates(confirmed_df['Date'])
+"""
+import json
+import os
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from loaders import measure, read_csv
+
+try:
+    import pyarrow
+    import pyarrow.feather as feather
+    import pyarrow.parquet as parquet
+except ImportError:
+    pyarrow = feather = parquet = None
+
+
+ID_COLUMNS = ['Province/State', 'Country/Region', 'Lat', 'Long']
+
+# the columns which tell one location from another
+KEY_COLUMNS = ['Province/State', 'Country/Region']
+
+# tried in this order by parse_dates(); the COVID files write
+# month/day/year
+DATE_FORMATS = ('%m/%d/%y', '%m/%d/%Y', '%Y-%m-%d', '%Y/%m/%d',
+                '%d/%m/%Y', '%d.%m.%Y', '%Y%m%d', '%b %d, %Y')
+
+
+def melt_series(wide, case_type, id_columns=ID_COLUMNS, dates=None):
+    """
+    The melt of get_and_melt_data(): one row per (location, date),
+    with the columns 'id_columns', 'Date' and 'case_type'. 'dates'
+    melts only those date columns.
+    """
+    if dates is not None:
+        wide = wide[list(id_columns) + list(dates)]
+
+    return wide.melt(id_vars=list(id_columns), var_name='Date',
+                     value_name=case_type)
+
+
+def location_keys(frame, key_columns=KEY_COLUMNS):
+    """
+    One key per row of 'frame', for matching the rows of two files.
+    A missing Province/State is the empty string, so it can match.
+    """
+    keys = pd.MultiIndex.from_arrays(
+        [frame[column].fillna('').astype(str)
+         for column in key_columns])
+    if not keys.is_unique:
+        raise ValueError('the columns ' + repr(key_columns)
+                         + ' do not tell the locations apart')
+    return keys
+
+
+"""
+1. Incremental updates
+"""
+
+
+class SeriesStore:
+    def __init__(self, folder, case_type, id_columns=ID_COLUMNS,
+                 key_columns=KEY_COLUMNS):
+        if feather is None:
+            raise ImportError('SeriesStore needs pyarrow')
+
+        self.folder = folder
+        self.case_type = case_type
+        self.id_columns = list(id_columns)
+        self.key_columns = list(key_columns)
+        self.manifest_path = os.path.join(folder, 'manifest.json')
+        self.snapshot_path = os.path.join(folder, 'snapshot.npy')
+        self.manifest = self.read_manifest()
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path) as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError):
+            return {'case_type': self.case_type, 'dates': [],
+                    'parts': []}
+
+    def write_manifest(self):
+        os.makedirs(self.folder, exist_ok=True)
+        temporary = self.manifest_path + '.tmp'
+        with open(temporary, 'w') as manifest_file:
+            json.dump(self.manifest, manifest_file)
+        os.replace(temporary, self.manifest_path)
+
+    def read(self, name):
+        return feather.read_table(os.path.join(self.folder, name),
+                                  memory_map=True).to_pandas()
+
+    def add_part(self, frame, kind):
+        if frame.empty:
+            return 0
+
+        os.makedirs(self.folder, exist_ok=True)
+        # never reuse a name: load() may still map the old parts
+        number = self.manifest.get('next_part', 0)
+        self.manifest['next_part'] = number + 1
+        name = 'part-' + str(number).zfill(5) + '.feather'
+        feather.write_feather(frame.reset_index(drop=True),
+                              os.path.join(self.folder, name),
+                              compression='uncompressed')
+        self.manifest['parts'].append({'file': name, 'kind': kind,
+                                       'rows': len(frame)})
+        return len(frame)
+
+    def update(self, wide, check_days=None):
+        """
+        Add what is new in 'wide' (the latest wide file, as a
+        DataFrame) to the store. Return how much was added.
+
+        'check_days': look for corrected cells in the last
+            'check_days' known dates only (None: in all of them).
+        """
+        dates = [column for column in wide.columns
+                 if column not in self.id_columns]
+        known_dates = set(self.manifest['dates'])
+        new_dates = [date for date in dates if date not in known_dates]
+        report = {'new_dates': len(new_dates), 'new_locations': 0,
+                  'revised_cells': 0, 'rows_added': 0}
+
+        if not self.manifest['parts']:
+            report['new_locations'] = len(wide)
+            report['rows_added'] = self.add_part(
+                melt_series(wide, self.case_type, self.id_columns),
+                'dates')
+            return self.finish(wide, dates, new_dates, report)
+
+        old_keys = pd.MultiIndex.from_tuples(
+            [tuple(key) for key in self.manifest['locations']])
+        positions = old_keys.get_indexer(
+            location_keys(wide, self.key_columns))
+        known = positions >= 0
+        old_dates = [date for date in self.manifest['dates']
+                     if date in wide.columns]
+
+        # every date of the new locations, the new dates of the others
+        report['new_locations'] = int((~known).sum())
+        if report['new_locations']:
+            report['rows_added'] += self.add_part(
+                melt_series(wide[~known], self.case_type,
+                            self.id_columns, old_dates), 'dates')
+        if new_dates:
+            report['rows_added'] += self.add_part(
+                melt_series(wide, self.case_type, self.id_columns,
+                            new_dates), 'dates')
+
+        checked = old_dates if check_days is None else (
+            old_dates[-check_days:] if check_days else [])
+        revisions = self.revisions(wide, positions, checked)
+        report['revised_cells'] = self.add_part(revisions, 'revisions')
+        return self.finish(wide, dates, new_dates, report)
+
+    def revisions(self, wide, positions, dates):
+        """
+        The cells of 'dates' whose value in 'wide' differs from the
+        snapshot, melted. 'positions': the row of the snapshot of
+        every row of 'wide' (-1 for new locations).
+        """
+        snapshot_dates = self.manifest['snapshot_dates']
+        known_dates = set(snapshot_dates)
+        dates = [date for date in dates if date in known_dates]
+        known = np.flatnonzero(positions >= 0)
+        if not dates or not len(known):
+            return pd.DataFrame()
+
+        columns = pd.Index(snapshot_dates).get_indexer(dates)
+        old_values = np.load(self.snapshot_path, mmap_mode='r')
+        old_values = old_values[positions[known]][:, columns]
+        values = wide[dates].to_numpy()[known]
+        new_values = values.astype(float)
+        changed = ~((new_values == old_values)
+                    | (np.isnan(new_values) & np.isnan(old_values)))
+        rows, columns = np.nonzero(changed)
+
+        revised = wide[self.id_columns].iloc[known[rows]].reset_index(
+            drop=True)
+        revised['Date'] = np.asarray(dates, dtype=object)[columns]
+        revised[self.case_type] = values[rows, columns]
+        return revised
+
+    def finish(self, wide, dates, new_dates, report):
+        """
+        Keep the values of 'wide' (a float array, for the next
+        revisions()) and its locations, and write the manifest.
+        """
+        temporary = self.snapshot_path + '.tmp'
+        with open(temporary, 'wb') as snapshot_file:
+            np.save(snapshot_file, wide[dates].to_numpy(dtype=float))
+        os.replace(temporary, self.snapshot_path)
+        self.manifest['snapshot_dates'] = dates
+        self.manifest['locations'] = [
+            list(key) for key in location_keys(wide, self.key_columns)]
+        self.manifest['dates'] += new_dates
+        self.write_manifest()
+        return report
+
+    def load(self):
+        """
+        The long table: all the parts, with the revisions applied.
+        """
+        parts = self.manifest['parts']
+        frames = [self.read(part['file']) for part in parts
+                  if part['kind'] == 'dates']
+        if not frames:
+            return pd.DataFrame(columns=self.id_columns
+                                + ['Date', self.case_type])
+        frame = pd.concat(frames, ignore_index=True)
+
+        revisions = [self.read(part['file']) for part in parts
+                     if part['kind'] == 'revisions']
+        if revisions:
+            keys = self.key_columns + ['Date']
+            revisions = pd.concat(revisions, ignore_index=True)
+            revisions = revisions.drop_duplicates(keys, keep='last')
+            rows = location_keys(frame, keys).get_indexer(
+                location_keys(revisions, keys))
+            values = frame[self.case_type].copy()
+            values.iloc[rows] = revisions[self.case_type].to_numpy()
+            frame[self.case_type] = values
+
+        return frame
+
+    def compact(self):
+        """
+        Rewrite all the parts as one, with the revisions applied.
+        """
+        frame = self.load()
+        old_parts = self.manifest['parts']
+        self.manifest['parts'] = []
+        self.add_part(frame, 'dates')
+        self.write_manifest()
+
+        for part in old_parts:
+            os.remove(os.path.join(self.folder, part['file']))
+
+
+"""
+2. Combining the series
+"""
+
+
+def shared_codes(arrays):
+    """
+    Integer codes for the values of several arrays (one per frame),
+    the same value getting the same code in all of them. Codes go
+    by the order in which the values first appear; missing values
+    get 0. Return (the codes of each array, the number of codes).
+    """
+    factorized = [pd.factorize(values) for values in arrays]
+    categories = pd.Index(pd.concat(
+        [pd.Series(uniques) for _, uniques in factorized],
+        ignore_index=True).unique())
+
+    codes = []
+    for local, uniques in factorized:
+        # the code -1 of a missing value picks the last entry: 0
+        mapping = np.append(categories.get_indexer(uniques) + 1, 0)
+        codes.append(mapping[local])
+
+    return codes, len(categories) + 1
+
+
+def row_keys(frames, on):
+    """
+    One int64 key per row of every frame: the 'on' columns but the
+    last (the location) come first, the last one (the date) is the
+    most significant. So a melted frame, day after day, comes out
+    sorted.
+    """
+    locations = [np.zeros(len(frame), dtype=np.int64) for frame in frames]
+    for column in on[:-1]:
+        codes, size = shared_codes([frame[column] for frame in frames])
+        locations = [location * size + code
+                     for location, code in zip(locations, codes)]
+
+    locations, n_locations = shared_codes(locations)
+    dates, _ = shared_codes([frame[on[-1]] for frame in frames])
+    return [date * n_locations + location
+            for date, location in zip(dates, locations)]
+
+
+def sorted_keys(keys):
+    """
+    Return (the keys sorted, the order which sorts them; None when
+    they were sorted already).
+    """
+    if np.all(keys[1:] > keys[:-1]):
+        return keys, None
+
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    if np.any(keys[1:] == keys[:-1]):
+        raise ValueError('the same key is on more than one row')
+    return keys, order
+
+
+def find_keys(sorted_frame_keys, order, keys):
+    """
+    The row of every key of 'keys' (sorted) in a frame, -1 when it
+    is not there.
+    """
+    if not len(sorted_frame_keys):
+        return np.full(len(keys), -1)
+    if np.array_equal(sorted_frame_keys, keys):
+        # the same keys (the usual case for series of one source)
+        return np.arange(len(keys)) if order is None else order
+
+    at = np.searchsorted(sorted_frame_keys, keys)
+    at[at == len(sorted_frame_keys)] = 0
+    found = sorted_frame_keys[at] == keys
+    rows = at if order is None else order[at]
+    return np.where(found, rows, -1)
+
+
+def combine_series(frames, on=KEY_COLUMNS + ['Date'], how='left'):
+    """
+    Put the columns of all 'frames' (melted series) side by side,
+    matching their rows on the 'on' columns.
+
+    'how': 'left' keeps the keys of the first frame, 'inner' the
+        keys found in every frame, 'outer' the keys of any frame.
+        As with pd.merge(), 'left' and 'inner' keep the rows in the
+        order of the first frame; 'outer' sorts them by key.
+
+    Return (the combined frame, the unmatched keys): one row per key
+    found in the first frame and not in another one, or the other
+    way around, with the columns 'on', 'Only in' and 'Missing
+    from' (named after the last new column of each frame: the
+    series of a melted frame).
+    """
+    if how not in ('left', 'inner', 'outer'):
+        raise ValueError("'how' must be 'left', 'inner' or 'outer'")
+
+    base = frames[0]
+    names = [[column for column in frame.columns if column not in on
+              and (frame is base or column not in base.columns)][-1]
+             for frame in frames]
+    indexes = [sorted_keys(keys) for keys in row_keys(frames, on)]
+
+    keys = indexes[0][0]
+    if how == 'inner':
+        for frame_keys, _ in indexes[1:]:
+            keys = np.intersect1d(keys, frame_keys, assume_unique=True)
+    elif how == 'outer':
+        for frame_keys, _ in indexes[1:]:
+            keys = np.union1d(keys, frame_keys)
+    rows = [find_keys(frame_keys, order, keys)
+            for frame_keys, order in indexes]
+    if how != 'outer' and indexes[0][1] is not None:
+        # back from key order to the order of the first frame
+        restore = np.argsort(rows[0], kind='stable')
+        rows = [frame_rows[restore] for frame_rows in rows]
+
+    if how == 'left':
+        combined = base.copy(deep=False)
+    else:
+        combined = take_rows(base, rows[0])
+    for frame, frame_rows in zip(frames[1:], rows[1:]):
+        for column in frame.columns:
+            if column in base.columns:
+                if how == 'outer':
+                    fill_missing(combined, frame, column, rows[0],
+                                 frame_rows)
+                continue
+            combined[column] = pd.api.extensions.take(
+                frame[column].array, frame_rows, allow_fill=True)
+
+    combined.reset_index(drop=True, inplace=True)
+    return combined, unmatched_keys(frames, on, names, indexes)
+
+
+def take_rows(frame, rows):
+    """
+    The rows 'rows' of 'frame', with missing values where a row is
+    -1.
+    """
+    return pd.DataFrame({
+        column: pd.api.extensions.take(frame[column].array, rows,
+                                       allow_fill=True)
+        for column in frame.columns})
+
+
+def fill_missing(combined, frame, column, base_rows, frame_rows):
+    """
+    For the keys of an outer combine which are not in the first
+    frame, take the value of 'column' from 'frame'.
+    """
+    missing = np.flatnonzero((base_rows < 0) & (frame_rows >= 0))
+    if len(missing):
+        values = combined[column].copy()
+        values.iloc[missing] = frame[column].to_numpy()[
+            frame_rows[missing]]
+        combined[column] = values
+
+
+def unmatched_keys(frames, on, names, indexes):
+    """
+    The keys of the first frame which are missing from each other
+    frame, and the keys of each other frame missing from the first.
+    """
+    unmatched = []
+    for number in range(1, len(frames)):
+        for this, other in ((0, number), (number, 0)):
+            keys, order = indexes[this]
+            lonely = np.flatnonzero(
+                find_keys(indexes[other][0], None, keys) < 0)
+            if order is not None:
+                lonely = np.sort(order[lonely])
+            unmatched.append(frames[this][on].iloc[lonely].assign(**{
+                'Only in': names[this], 'Missing from': names[other]}))
+
+    if not unmatched:
+        return pd.DataFrame(columns=list(on) + ['Only in', 'Missing from'])
+    return pd.concat(unmatched, ignore_index=True)
+
+
+"""
+3. A lighter melt
+"""
+
+
+def small_codes(codes, n_categories):
+    """
+    'codes' in the smallest integer type which holds
+    'n_categories' codes (and -1, for missing values).
+    """
+    return codes.astype(np.min_scalar_type(-max(n_categories, 1)))
+
+
+def typed_names(names, var_type=None, date_format=None):
+    """
+    The column names 'names', as the values of the 'variable'
+    column: as they are, as dates ('datetime'), as the number they
+    hold ('int': 'wk12' is 12), or through a function.
+    """
+    names = pd.Index(names)
+    if var_type is None:
+        return names
+    if var_type == 'datetime':
+        return pd.DatetimeIndex(to_dates(names, date_format))
+    if var_type == 'int':
+        numbers = names.astype(str).str.extract(r'(\d+)', expand=False)
+        return pd.Index(pd.to_numeric(numbers)).astype('Int64')
+    if callable(var_type):
+        return pd.Index(var_type(names))
+
+    raise ValueError("'var_type' must be None, 'datetime', 'int' or a "
+                     "function")
+
+
+def light_melt(frame, id_vars, value_vars=None, var_name='variable',
+               value_name='value', var_type=None, date_format=None):
+    """
+    Like pd.melt(frame, id_vars, value_vars, var_name, value_name),
+    with the same rows in the same order, but the id columns and
+    the 'var_name' column are categoricals, and the 'var_name'
+    column is typed by 'var_type' (see typed_names()).
+    """
+    id_vars = [id_vars] if isinstance(id_vars, str) else list(id_vars)
+    if value_vars is None:
+        value_vars = [column for column in frame.columns
+                      if column not in id_vars]
+    value_vars = list(value_vars)
+    n_rows, n_values = len(frame), len(value_vars)
+
+    columns = {}
+    for column in id_vars:
+        codes, categories = pd.factorize(frame[column])
+        columns[column] = pd.Categorical.from_codes(
+            np.tile(small_codes(codes, len(categories)), n_values),
+            categories)
+
+    # sorted categories, so that the variable sorts by its value
+    codes, categories = pd.factorize(
+        typed_names(value_vars, var_type, date_format), sort=True)
+    columns[var_name] = pd.Categorical.from_codes(
+        np.repeat(small_codes(codes, len(categories)), n_rows),
+        categories, ordered=var_type is not None)
+
+    dtypes = {frame[column].dtype for column in value_vars}
+    if len(dtypes) == 1 and isinstance(dtypes.pop(), np.dtype):
+        columns[value_name] = np.concatenate(
+            [frame[column].to_numpy() for column in value_vars])
+    else:
+        columns[value_name] = pd.concat(
+            [frame[column] for column in value_vars],
+            ignore_index=True)
+
+    return pd.DataFrame(columns)
+
+
+"""
+4. Streaming melt
+"""
+
+
+class CSVWriter:
+    def __init__(self, path):
+        self.path = path
+        self.header = True
+
+    def write(self, frame):
+        frame.to_csv(self.path, mode='w' if self.header else 'a',
+                     header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        if self.header:
+            open(self.path, 'w').close()
+
+
+class ParquetWriter:
+    """
+    Appends DataFrames to one Parquet file, as row groups. The
+    schema comes from the first one (a column which was all
+    missing there is taken as text). Categorical columns are
+    written as Parquet dictionaries, with int32 codes, so that
+    every chunk fits the same schema.
+    """
+
+    def __init__(self, path):
+        if parquet is None:
+            raise ImportError('writing .parquet files needs pyarrow')
+
+        self.path = path
+        self.writer = None
+
+    def write(self, frame):
+        table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+        if self.writer is None:
+            schema = pyarrow.schema([
+                field.with_type(self.column_type(column))
+                for field, column in zip(table.schema, table.columns)])
+            self.writer = parquet.ParquetWriter(self.path, schema)
+
+        # a column with no value at all may have come out as numbers
+        schema = self.writer.schema
+        columns = [pyarrow.nulls(len(column), field.type)
+                   if column.null_count == len(column)
+                   else column.cast(field.type)
+                   for column, field in zip(table.columns, schema)]
+        self.writer.write_table(
+            pyarrow.Table.from_arrays(columns, schema=schema))
+
+    @staticmethod
+    def column_type(column):
+        data_type = column.type
+        is_dictionary = pyarrow.types.is_dictionary(data_type)
+        if is_dictionary:
+            data_type = data_type.value_type
+        if column.null_count == len(column):
+            data_type = pyarrow.string()
+
+        if is_dictionary:
+            return pyarrow.dictionary(pyarrow.int32(), data_type)
+        return data_type
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def long_writer(output):
+    if str(output).endswith('.parquet'):
+        return ParquetWriter(output)
+    if str(output).endswith(('.csv', '.csv.gz')):
+        return CSVWriter(output)
+
+    raise ValueError('cannot tell the format of ' + repr(output)
+                     + ': use a .csv or .parquet file name')
+
+
+def stream_melt(path, output, id_vars, var_name='variable',
+                value_name='value', var_type=None, date_format=None,
+                chunk_rows=10_000, **options):
+    """
+    Melt the wide .csv file 'path' (a path or a URL) into 'output'
+    (a .csv or .parquet file), 'chunk_rows' rows at a time. The
+    other arguments are those of light_melt(); 'options' go to
+    read_csv(). Return the number of rows written.
+    """
+    writer = long_writer(output)
+    n_rows = 0
+    try:
+        for chunk in read_csv(path, chunksize=chunk_rows, **options):
+            long = light_melt(chunk, id_vars, var_name=var_name,
+                              value_name=value_name, var_type=var_type,
+                              date_format=date_format)
+            writer.write(long)
+            n_rows += len(long)
+    finally:
+        writer.close()
+
+    return n_rows
+
+
+"""
+5. Parsing dates once
+"""
+
+
+def infer_date_format(strings):
+    """
+    The first of DATE_FORMATS which reads all of 'strings' (None if
+    none does).
+    """
+    for date_format in DATE_FORMATS:
+        try:
+            pd.to_datetime(strings, format=date_format)
+        except (ValueError, TypeError):
+            continue
+        return date_format
+
+    return None
+
+
+def to_dates(strings, date_format=None):
+    """
+    pd.to_datetime() of a few DISTINCT strings, with 'date_format',
+    or else the format inferred from them.
+    """
+    strings = pd.Index(strings)
+    if date_format is None and strings.inferred_type == 'string':
+        date_format = infer_date_format(strings)
+
+    return pd.to_datetime(strings, format=date_format)
+
+
+def parse_dates(values, date_format=None):
+    """
+    Like pd.to_datetime(values), but each distinct value is parsed
+    only once. 'values': a Series (categorical or not) or an array.
+    Missing values give NaT.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # the codes are already there: parse the categories only
+        codes = np.asarray(values.cat.codes if isinstance(
+            values, pd.Series) else values.codes)
+        uniques = values.dtype.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    dates = to_dates(uniques, date_format)
+    parsed = dates.take(codes, allow_fill=True, fill_value=pd.NaT)
+
+    if isinstance(values, pd.Series):
+        return pd.Series(parsed, index=values.index, name=values.name)
+    return parsed
+
+
+"""
+6. Benchmarks
+
+    6.1 Write a COVID-like wide file with 'n_days' days, then time one
+        daily update with one more day (and a few corrected cells)
+        both ways: read_csv() + melt of the whole file, the way of
+        get_and_melt_data(), against read_csv() +
+        SeriesStore.update(), and check that the store gives the
+        same long table.
+"""
+
+
+def make_wide_series(n_locations=280, n_days=1000, random_state=0):
+    rng = np.random.default_rng(random_state)
+    frame = pd.DataFrame({
+        'Province/State': ['Province ' + str(number) if number % 3
+                           else None
+                           for number in range(n_locations)],
+        'Country/Region': ['Country ' + str(number // 3)
+                           for number in range(n_locations)],
+        'Lat': rng.uniform(-60, 70, n_locations).round(4),
+        'Long': rng.uniform(-180, 180, n_locations).round(4)})
+
+    dates = pd.date_range('2020-01-22', periods=n_days)
+    counts = rng.poisson(20, (n_locations, n_days)).cumsum(axis=1)
+    days = pd.DataFrame(counts, columns=[
+        str(date.month) + '/' + str(date.day) + '/'
+        + str(date.year % 100) for date in dates])
+    return pd.concat([frame, days], axis=1)
+
+
+def benchmark_series_store(n_locations=280, n_days=1000):
+    wide = make_wide_series(n_locations, n_days + 1)
+    yesterday = wide.iloc[:, :-1]
+    today = wide.copy()
+    today.iloc[:5, -10] += 1        # corrected cells
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'today.csv')
+        yesterday.to_csv(path, index=False)
+        store = SeriesStore(os.path.join(folder, 'store'), 'Confirmed')
+        store.update(pd.read_csv(path))
+        today.to_csv(path, index=False)
+
+        start = time.perf_counter()
+        expected = melt_series(pd.read_csv(path), 'Confirmed')
+        print('     read_csv() + melt everything: ',
+              round(time.perf_counter() - start, 3), 's')
+
+        start = time.perf_counter()
+        report = store.update(pd.read_csv(path))
+        print('     read_csv() + update():        ',
+              round(time.perf_counter() - start, 3), 's', report)
+
+        start = time.perf_counter()
+        result = store.load()
+        print('     load():                       ',
+              round(time.perf_counter() - start, 3), 's')
+
+        pd.testing.assert_frame_equal(result, expected)
+
+
+# benchmark_series_store()
+
+
+"""
+    6.2 Melt three COVID-like series (the 'recovered' one with
+        fewer locations, like the real file), then time combining
+        them with pd.merge() on the keys against combine_series(),
+        and check that both give the same frame.
+"""
+
+
+def benchmark_combine_series(n_locations=280, n_days=1000):
+    wide = make_wide_series(n_locations, n_days)
+    confirmed = melt_series(wide, 'Confirmed')
+    death = melt_series(wide, 'Death')
+    recovered = melt_series(wide.iloc[:-20], 'Recovered')
+    print('     Rows: ', len(confirmed), len(death), len(recovered))
+
+    on = KEY_COLUMNS + ['Date']
+    start = time.perf_counter()
+    expected = confirmed.merge(
+        death[on + ['Death']], on=on, how='left').merge(
+        recovered[on + ['Recovered']], on=on, how='left')
+    print('     pd.merge():       ',
+          round(time.perf_counter() - start, 3), 's')
+
+    start = time.perf_counter()
+    combined, unmatched = combine_series([confirmed, death, recovered])
+    print('     combine_series(): ',
+          round(time.perf_counter() - start, 3), 's, unmatched keys:',
+          len(unmatched))
+
+    pd.testing.assert_frame_equal(combined, expected)
+
+    # a first frame out of key order keeps its own order
+    shuffled = confirmed.sample(frac=1, random_state=0).reset_index(
+        drop=True)
+    for how in ('left', 'inner'):
+        expected = shuffled.merge(
+            death[on + ['Death']], on=on, how=how).merge(
+            recovered[on + ['Recovered']], on=on, how=how)
+        combined, _ = combine_series([shuffled, death, recovered],
+                                     how=how)
+        pd.testing.assert_frame_equal(combined, expected)
+
+
+# benchmark_combine_series()
+
+
+"""
+    6.3 Melt a COVID-like series of 'n_locations' locations and
+        'n_days' days (about the size of the global confirmed
+        file) with pd.melt() and with light_melt(), and compare
+        the time, the peak memory (tracemalloc) and the memory of
+        the result.
+"""
+
+
+def benchmark_light_melt(n_locations=289, n_days=1143):
+    wide = make_wide_series(n_locations, n_days)
+    wide['Province/State'] = wide['Province/State'].astype(str)
+    wide['Country/Region'] = wide['Country/Region'].astype(str)
+
+    for name, function in (
+            ('pd.melt():   ', lambda: pd.melt(
+                wide, id_vars=ID_COLUMNS, var_name='Date',
+                value_name='Confirmed')),
+            ('light_melt():', lambda: light_melt(
+                wide, ID_COLUMNS, var_name='Date',
+                value_name='Confirmed', var_type='datetime',
+                date_format='%m/%d/%y'))):
+        frame, seconds, peak = measure(function)
+        print('     ' + name, round(seconds, 3), 's,',
+              round(peak / 1024 ** 2), 'MB peak,',
+              round(frame.memory_usage(deep=True).sum() / 1024 ** 2),
+              'MB result')
+
+    expected = pd.melt(wide, id_vars=ID_COLUMNS, var_name='Date',
+                       value_name='Confirmed')
+    expected['Date'] = pd.to_datetime(expected['Date'],
+                                      format='%m/%d/%y')
+    result = frame.astype({column: frame[column].cat.categories.dtype
+                           for column in ID_COLUMNS + ['Date']})
+    pd.testing.assert_frame_equal(result, expected)
+
+
+# benchmark_light_melt()
+
+
+"""
+    6.4 Write a wide file of 'n_locations' rows and 'n_days' day
+        columns, then melt it into a .parquet file: loading it
+        whole and melting (pd.melt()) against stream_melt(), with
+        the peak memory of each, and check that the rows are the
+        same.
+"""
+
+
+def benchmark_stream_melt(n_locations=5_000, n_days=1000,
+                          chunk_rows=1_000):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'wide.csv')
+        make_wide_series(n_locations, n_days).to_csv(path, index=False)
+        print('     File size: ', os.path.getsize(path), 'bytes')
+
+        expected_path = os.path.join(folder, 'expected.parquet')
+        output = os.path.join(folder, 'long.parquet')
+        for name, function in (
+                ('read_csv() + pd.melt():', lambda: pd.melt(
+                    pd.read_csv(path), id_vars=ID_COLUMNS,
+                    var_name='Date', value_name='Confirmed'
+                    ).to_parquet(expected_path, index=False)),
+                ('stream_melt():         ', lambda: stream_melt(
+                    path, output, ID_COLUMNS, var_name='Date',
+                    value_name='Confirmed', chunk_rows=chunk_rows,
+                    cache=False))):
+            _, seconds, peak = measure(function)
+            print('     ' + name, round(seconds, 2), 's,',
+                  round(peak / 1024 ** 2), 'MB peak')
+
+        on = KEY_COLUMNS + ['Date']
+        expected = pd.read_parquet(expected_path).sort_values(on)
+        result = pd.read_parquet(output)
+        result = result.astype({column: expected[column].dtype
+                                for column in result.columns})
+        result = result.sort_values(on)
+        pd.testing.assert_frame_equal(result.reset_index(drop=True),
+                                      expected.reset_index(drop=True))
+
+
+# benchmark_stream_melt()
+
+
+"""
+    6.5 Melt a COVID-like series, then time turning its 'Date'
+        column into dates with pd.to_datetime() (no format, the
+        way most code does it), and with parse_dates(), on the
+        text column and on the categorical one of light_melt().
+"""
+
+
+def benchmark_parse_dates(n_locations=289, n_days=1143):
+    wide = make_wide_series(n_locations, n_days)
+    dates = melt_series(wide, 'Confirmed')['Date']
+    categorical = light_melt(wide, ID_COLUMNS, var_name='Date')['Date']
+    print('     Rows: ', len(dates), ' Distinct dates: ', n_days)
+
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        # 'Could not infer format': the reason it is slow
+        warnings.simplefilter('ignore', UserWarning)
+        expected = pd.to_datetime(dates)
+    print('     pd.to_datetime():            ',
+          round(time.perf_counter() - start, 3), 's')
+
+    for name, values in (('parse_dates():              ', dates),
+                         ('parse_dates(categorical):   ', categorical)):
+        start = time.perf_counter()
+        result = parse_dates(values)
+        print('     ' + name, round(time.perf_counter() - start, 3), 's')
+        pd.testing.assert_series_equal(result, expected,
+                                       check_dtype=False)
+
+
+# benchmark_parse_dates()